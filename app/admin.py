@@ -1,9 +1,31 @@
 from __future__ import annotations
 
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.actions import delete_selected as django_delete_selected
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
+from django.db import transaction
 
-from .models import Event, FinancialTransaction, Member, MembershipFee, Participation, User
+from . import fiscal
+from .models import Event, FinancialTransaction, FiscalYearClosing, Member, MembershipFee, Participation, User
+
+
+class ClosedYearDeleteMixin:
+    """Eliminazione multipla che, se la selezione tocca un esercizio chiuso, non elimina nulla e lo segnala."""
+
+    actions = ["delete_selected"]
+
+    def check_deletable(self, queryset) -> None:
+        """Solleva :class:`~app.fiscal.ClosedYearError` se la selezione non si puo' eliminare."""
+
+    @admin.action(permissions=["delete"], description=django_delete_selected.short_description)
+    def delete_selected(self, request, queryset):
+        try:
+            with transaction.atomic():  # anche le voci del registro delle modifiche
+                self.check_deletable(queryset)
+                return django_delete_selected(self, request, queryset)
+        except fiscal.ClosedYearError as exc:
+            self.message_user(request, str(exc), messages.ERROR)
+            return None
 
 
 @admin.register(User)
@@ -15,7 +37,8 @@ class UserAdmin(DjangoUserAdmin):
 
 @admin.register(Member)
 class MemberAdmin(admin.ModelAdmin):
-    list_display = ("full_name", "email", "phone", "role", "active")
+    list_display = ("full_name", "email", "phone", "role", "active", "events_attended", "fees_pending", "arrears")
+    readonly_fields = ("events_registered", "events_attended", "fees_paid", "fees_pending", "arrears")
     search_fields = ("first_name", "last_name", "email")
     list_filter = ("role", "active")
 
@@ -28,20 +51,67 @@ class MembershipFeeAdmin(admin.ModelAdmin):
 
 
 @admin.register(Event)
-class EventAdmin(admin.ModelAdmin):
-    list_display = ("title", "date", "location")
+class EventAdmin(ClosedYearDeleteMixin, admin.ModelAdmin):
+    list_display = ("title", "date", "location", "capacity", "participants_count", "waitlist_count", "present_count")
+    readonly_fields = ("participants_count", "waitlist_count", "present_count")
     list_filter = ("date",)
     search_fields = ("title", "location")
 
+    def check_deletable(self, queryset) -> None:
+        for event_id in queryset.values_list("pk", flat=True):
+            fiscal.ensure_event_deletable(event_id)
+
+    def has_delete_permission(self, request, obj=None):
+        allowed = super().has_delete_permission(request, obj)
+        if not allowed or obj is None:
+            return allowed
+        try:
+            fiscal.ensure_event_deletable(obj.pk)
+        except fiscal.ClosedYearError:
+            return False
+        return True
+
 
 @admin.register(Participation)
 class ParticipationAdmin(admin.ModelAdmin):
-    list_display = ("event", "member", "presence", "registered_at")
-    list_filter = ("presence", "event")
+    list_display = ("event", "member", "presence", "waitlisted", "registered_at")
+    list_filter = ("presence", "waitlisted", "event")
 
 
 @admin.register(FinancialTransaction)
-class FinancialTransactionAdmin(admin.ModelAdmin):
+class FinancialTransactionAdmin(ClosedYearDeleteMixin, admin.ModelAdmin):
     list_display = ("transaction_type", "amount", "date", "event")
     list_filter = ("transaction_type", "date")
     search_fields = ("description",)
+
+    def _is_open(self, obj) -> bool:
+        try:
+            fiscal.ensure_open([obj.date])
+        except fiscal.ClosedYearError:
+            return False
+        return True
+
+    def check_deletable(self, queryset) -> None:
+        fiscal.ensure_open(queryset.values_list("date", flat=True))
+
+    def has_change_permission(self, request, obj=None):
+        return super().has_change_permission(request, obj) and (obj is None or self._is_open(obj))
+
+    def has_delete_permission(self, request, obj=None):
+        return super().has_delete_permission(request, obj) and (obj is None or self._is_open(obj))
+
+
+@admin.register(FiscalYearClosing)
+class FiscalYearClosingAdmin(admin.ModelAdmin):
+    """Sola consultazione: le chiusure si creano con ``manage.py close_fiscal_year``."""
+
+    list_display = ("year", "opening_balance", "income", "expense", "closing_balance", "closed_at")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class AppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "app"
+
+    def ready(self) -> None:
+        from . import signals  # noqa: F401  registra i ricevitori dei segnali
+        from .database import tune_sqlite
+
+        connection_created.connect(tune_sqlite, dispatch_uid="assohub_tune_sqlite")
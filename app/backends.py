@@ -0,0 +1,22 @@
+"""Backend di autenticazione di AssoHUB."""
+from __future__ import annotations
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class MemberAwareBackend(ModelBackend):
+    """``ModelBackend`` che carica l'utente insieme all'iscritto collegato.
+
+    Il ``User`` di ogni richiesta arriva con una sola query gia' completo di
+    ``member``: menu, template e viste che leggono ``display_name``,
+    ``has_member`` o ``request.user.member`` non generano altre query.
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related("member").get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
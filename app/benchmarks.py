@@ -0,0 +1,802 @@
+"""Scenari di benchmark eseguiti dal comando ``manage.py benchmark``.
+
+Ogni scenario riceve le opzioni del comando e restituisce un dizionario
+``{nome_misura: {metrica: valore}}`` serializzabile in JSON. Le metriche
+che terminano con ``_ms``, ``_kb`` o ``queries`` sono "piu' basso e' meglio",
+quelle che terminano con ``_per_s`` sono "piu' alto e' meglio": su questa
+convenzione si basa il confronto con un risultato precedente.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from urllib.parse import urlencode
+from statistics import quantiles
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.management.utils import get_random_secret_key
+from django.db import OperationalError, connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import reports, search, summaries
+from .fee_campaigns import generate_fees
+from .registrations import register
+from .reports import build_report
+from .models import Event, FinancialTransaction, Member, Participation, SearchDocument, User
+from .pagination import KeysetPage
+from .seed import DEFAULT_PASSWORD, create_accounts, seed_association
+
+Results = Dict[str, Dict[str, float]]
+SCENARIOS: Dict[str, Callable[[dict], Results]] = {}
+
+
+def scenario(name: str):
+    def register(func: Callable[[dict], Results]):
+        SCENARIOS[name] = func
+        return func
+
+    return register
+
+
+def percentiles(samples: List[float]) -> Tuple[float, float, float]:
+    """p50, p95 e p99 dei campioni (in millisecondi)."""
+
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return value, value, value
+    cuts = quantiles(samples, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+def compare(current: Results, baseline: Results, threshold: float) -> List[str]:
+    """Elenca le misure peggiorate oltre ``threshold`` rispetto al riferimento."""
+
+    regressions = []
+    for name, metrics in current.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        for metric, value in metrics.items():
+            previous = reference.get(metric)
+            if not isinstance(previous, (int, float)) or not previous:
+                continue
+            if metric.endswith("queries") and value > previous:
+                regressions.append(f"{name} {metric}: {previous} -> {value}")
+            elif metric.endswith(("_ms", "_kb")) and value > previous * threshold:
+                regressions.append(f"{name} {metric}: {previous:.2f} -> {value:.2f}")
+            elif metric.endswith("_per_s") and value * threshold < previous:
+                regressions.append(f"{name} {metric}: {previous:.2f} -> {value:.2f}")
+    return regressions
+
+
+def measure_requests(
+    client: Client, method: str, url: str, iterations: int, before: Optional[Callable[[], None]] = None
+) -> Dict[str, float]:
+    """Esegue ``iterations`` richieste e raccoglie latenza, query e memoria di picco."""
+
+    timings: List[float] = []
+    queries = 0
+    status = 0
+    for _ in range(iterations):
+        if before is not None:
+            before()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = getattr(client, method)(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = max(queries, len(captured))
+        status = response.status_code
+
+    # la memoria si misura a parte: tracemalloc rallenta molto l'esecuzione
+    if before is not None:
+        before()
+    tracemalloc.start()
+    try:
+        getattr(client, method)(url)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    p50, p95, p99 = percentiles(timings)
+    return {
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(p95, 3),
+        "p99_ms": round(p99, 3),
+        "queries": queries,
+        "peak_kb": round(peak / 1024, 1),
+        "status": status,
+    }
+
+
+def measure_call(func: Callable[[], object]) -> Tuple[object, Dict[str, float]]:
+    """Esegue ``func`` una volta e ne misura durata e query."""
+
+    connection.queries_log.clear()  # il registro tiene al massimo 9000 query: oltre, il conteggio si azzera
+    with CaptureQueriesContext(connection) as captured:
+        started = time.perf_counter()
+        value = func()
+        elapsed = (time.perf_counter() - started) * 1000
+    return value, {"elapsed_ms": round(elapsed, 3), "queries": len(captured)}
+
+
+def view_requests(admin, associate) -> Iterable[Tuple[str, str, str, Optional[Callable[[], None]]]]:
+    """Richieste da misurare per ogni vista: (nome, metodo, url, preparazione)."""
+
+    from .urls import urlpatterns
+
+    event = Event.objects.filter(date__gte=timezone.now()).order_by("date").first()
+    participation = Participation.objects.filter(event=event).first()
+    member_id = associate.member_id
+
+    def reset_registration():
+        Participation.objects.filter(event=event, member_id=admin.member_id).delete()
+
+    kwargs = {
+        "member_update": {"pk": member_id},
+        "member_delete": {"pk": member_id},
+        "member_fees": {"member_id": member_id},
+        "event_update": {"pk": event.pk},
+        "event_register": {"event_id": event.pk},
+        "event_checkin": {"event_id": event.pk},
+        "export_csv": {"kind": "movimenti"},
+        "participation_update": {"event_id": event.pk, "pk": participation.pk},
+    }
+    for pattern in urlpatterns:
+        url = reverse(pattern.name, kwargs=kwargs.get(pattern.name, {}))
+        if pattern.name == "logout":
+            continue  # chiuderebbe la sessione usata dalle altre misure
+        before = reset_registration if pattern.name == "event_register" else None
+        yield pattern.name, "get", url, before
+
+
+@scenario("views")
+def views_scenario(options: dict) -> Results:
+    """Latenza, query e memoria di ogni vista, da anonimo e da amministratore."""
+
+    admin, associate = create_accounts()
+    seed_association(
+        members=options["members"],
+        users=options["users"],
+        events=options["events"],
+        participations_per_event=options["participations"],
+        transactions=options["transactions"],
+        random_seed=options["seed"],
+    )
+    if not Event.objects.filter(date__gte=timezone.now()).exists():
+        Event.objects.create(title="Assemblea", date=timezone.now() + timezone.timedelta(days=7), location="Sede")
+    event = Event.objects.filter(date__gte=timezone.now()).order_by("date").first()
+    Participation.objects.get_or_create(event=event, member=Member.objects.exclude(user=admin).first())
+
+    clients = {"anonimo": Client()}
+    clients["amministratore"] = Client()
+    clients["amministratore"].force_login(admin)
+    results: Results = {}
+    for name, method, url, before in view_requests(admin, associate):
+        for label, client in clients.items():
+            results[f"{name} [{label}]"] = measure_requests(client, method, url, options["iterations"], before)
+    return results
+
+
+@scenario("fee_campaign")
+def fee_campaign_scenario(options: dict) -> Results:
+    """Generazione delle quote annuali con un decimo e con tutti gli iscritti richiesti.
+
+    Con ``--members 50000`` mostra che durata e numero di query crescono
+    al piu' linearmente con gli iscritti; la seconda esecuzione sullo stesso
+    anno non deve creare nulla.
+    """
+
+    results: Results = {}
+    year = timezone.now().year + 1
+    total = options["members"]
+    for size in (max(1, total // 10), total):
+        seed_association(
+            members=size - Member.objects.count(),
+            users=0,
+            events=0,
+            transactions=0,
+            fee_years=0,
+            random_seed=options["seed"],
+        )
+        active = Member.objects.filter(active=True).count()
+        amount = Decimal("30.00")
+        _, dry_run = measure_call(lambda: generate_fees(year, amount, dry_run=True))
+        campaign, metrics = measure_call(lambda: generate_fees(year, amount))
+        _, repeated = measure_call(lambda: generate_fees(year, amount))
+        seconds = metrics["elapsed_ms"] / 1000 or 1e-9
+        results[f"quote {size} iscritti"] = {
+            "active_members": active,
+            "created": campaign.created,
+            "dry_run_ms": dry_run["elapsed_ms"],
+            "dry_run_queries": dry_run["queries"],
+            "generate_ms": metrics["elapsed_ms"],
+            "generate_queries": metrics["queries"],
+            "repeat_ms": repeated["elapsed_ms"],
+            "repeat_queries": repeated["queries"],
+            "fees_per_s": round(campaign.created / seconds, 1),
+        }
+        year += 1
+    return results
+
+
+@scenario("members_list")
+def members_list_scenario(options: dict) -> Results:
+    """Elenco iscritti con un centesimo, un decimo e tutti gli ``--members`` iscritti.
+
+    Con ``--members 100000`` la latenza di ogni pagina (prima, in fondo
+    all'elenco, ricerca, filtri) deve restare pressoche' costante al crescere
+    della tabella, perche' ogni query e' servita da un indice.
+    """
+
+    admin, _ = create_accounts()
+    client = Client()
+    client.force_login(admin)
+    url = reverse("members_list")
+    results: Results = {}
+    total = options["members"]
+    for size in sorted({max(1, total // 100), max(1, total // 10), total}):
+        seed_association(
+            members=size - Member.objects.count(),
+            users=0,
+            events=0,
+            transactions=0,
+            fee_years=0,
+            random_seed=options["seed"],
+        )
+        ordering = ("last_name", "first_name", "id")
+        last = Member.objects.order_by(*ordering)[max(0, size - 60)]
+        deep = KeysetPage(items=[last], ordering=ordering, has_next=True).next_cursor()
+        pages = {
+            "prima pagina": f"{url}",
+            "ultima pagina": f"{url}?{urlencode({'cursore': deep})}",
+            "ricerca cognome": f"{url}?q=rossi",
+            "ricerca email": f"{url}?q=socio1",
+            "amministratori": f"{url}?ruolo={Member.ROLE_AMMINISTRATORE}",
+            "inattivi": f"{url}?stato=0",
+        }
+        for name, page_url in pages.items():
+            results[f"members_list {name} [{size} iscritti]"] = measure_requests(
+                client, "get", page_url, options["iterations"]
+            )
+    return results
+
+
+@scenario("search")
+def search_scenario(options: dict) -> Results:
+    """Ricerca globale su ``--members`` iscritti, ``--events`` eventi e ``--transactions`` movimenti."""
+
+    admin, _ = create_accounts()
+    seed_association(
+        members=options["members"],
+        users=0,
+        events=options["events"],
+        participations_per_event=0,
+        transactions=options["transactions"],
+        fee_years=0,
+        random_seed=options["seed"],
+    )
+    client = Client()
+    client.force_login(admin)
+    url = reverse("search")
+    queries = {
+        "cognome": "rossi",
+        "prefisso corto": "ma",
+        "nome e cognome": "maria bian",
+        "email": "socio12",
+        "eventi": "evento",
+        "movimenti": "movimento 1",
+        "nessun risultato": "zzzz",
+    }
+    results: Results = {
+        "indice": {"documents": SearchDocument.objects.count(), "engine_fts5": int(search.backend() == "fts5")}
+    }
+    for name, text in queries.items():
+        results[f"search {name}"] = measure_requests(
+            client, "get", f"{url}?{urlencode({'q': text, 'formato': 'json'})}", options["iterations"]
+        )
+    return results
+
+
+def _wsgi_worker(cookies, url: str, iterations: int) -> List[float]:
+    client = Client()
+    client.cookies = cookies
+    timings = []
+    try:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        connections.close_all()  # connessioni aperte da questo thread
+    return timings
+
+
+async def _asgi_worker(cookies, url: str, iterations: int) -> List[float]:
+    client = AsyncClient()
+    client.cookies = cookies
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def _asgi_clients(cookies, url: str, iterations: int, concurrency: int) -> List[List[float]]:
+    return await asyncio.gather(*(_asgi_worker(cookies, url, iterations) for _ in range(concurrency)))
+
+
+def measure_concurrent(server: str, cookies, url: str, iterations: int, concurrency: int) -> Dict[str, float]:
+    """Throughput di ``concurrency`` client che eseguono ``iterations`` richieste ciascuno."""
+
+    started = time.perf_counter()
+    if server == "wsgi":
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            workers = [pool.submit(_wsgi_worker, cookies, url, iterations) for _ in range(concurrency)]
+            samples = [future.result() for future in workers]
+    else:
+        samples = asyncio.run(_asgi_clients(cookies, url, iterations, concurrency))
+    elapsed = time.perf_counter() - started
+    timings = [value for worker in samples for value in worker]
+    p50, p95, _ = percentiles(timings)
+    return {
+        "requests_per_s": round(len(timings) / elapsed, 1),
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(p95, 3),
+    }
+
+
+@scenario("asgi")
+def asgi_scenario(options: dict) -> Results:
+    """Throughput delle pagine pubbliche asincrone con client concorrenti, via WSGI e via ASGI.
+
+    Con WSGI ogni client e' un thread che usa il test client sincrono (come
+    un server a thread); con ASGI tutti i client condividono un solo ciclo
+    eventi tramite ``AsyncClient``.
+    """
+
+    admin, associate = create_accounts()
+    seed_association(
+        members=options["members"],
+        users=options["users"],
+        events=options["events"],
+        participations_per_event=options["participations"],
+        transactions=options["transactions"],
+        random_seed=options["seed"],
+    )
+    logged_in = Client()
+    logged_in.force_login(associate)
+    sessions = {"anonimo": Client().cookies, "associato": logged_in.cookies}
+    pages = [
+        ("home", reverse("home"), "anonimo"),
+        ("home", reverse("home"), "associato"),
+        ("events_list", reverse("events_list"), "associato"),
+        ("member_fees", reverse("member_fees", args=[associate.member_id]), "associato"),
+    ]
+    results: Results = {}
+    for name, url, label in pages:
+        for server in ("wsgi", "asgi"):
+            results[f"{name} [{label}, {server}]"] = measure_concurrent(
+                server, sessions[label], url, options["iterations"], options["concurrency"]
+            )
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"Il server si e' chiuso con codice {process.returncode}.")
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"Il server non risponde su {url}.")
+
+
+def _http_worker(url: str, iterations: int) -> List[float]:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def measure_http(url: str, iterations: int, concurrency: int) -> Dict[str, float]:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(lambda _: _http_worker(url, iterations), range(concurrency)))
+    elapsed = time.perf_counter() - started
+    timings = [value for worker in samples for value in worker]
+    p50, p95, _ = percentiles(timings)
+    return {
+        "requests_per_s": round(len(timings) / elapsed, 1),
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(p95, 3),
+    }
+
+
+@scenario("server")
+def server_scenario(options: dict) -> Results:
+    """Throughput di ``run.py`` in modalita' produzione con 1 e con ``--workers`` worker.
+
+    Il server gira in un processo separato su un database SQLite temporaneo,
+    quindi misura anche il costo reale di HTTP e del passaggio tra processi.
+    """
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError as exc:
+        raise CommandError("Lo scenario server richiede gunicorn: pip install -r requirements-prod.txt") from exc
+
+    base_dir = Path(settings.BASE_DIR)
+    results: Results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            os.environ,
+            DATABASE_URL="",
+            ASSOHUB_DB_NAME=str(Path(directory) / "benchmark.sqlite3"),
+            ASSOHUB_MODE="produzione",
+            ASSOHUB_SECRET_KEY=os.environ.get("ASSOHUB_SECRET_KEY") or get_random_secret_key(),
+            ASSOHUB_ALLOWED_HOSTS="127.0.0.1,localhost",
+        )
+        manage = [sys.executable, str(base_dir / "manage.py")]
+        subprocess.run(manage + ["migrate", "--verbosity", "0"], env=env, check=True, cwd=base_dir)
+        seed = (
+            "from app.seed import seed_association; "
+            f"seed_association(members={options['members']}, users=0, events={options['events']}, "
+            f"participations_per_event={options['participations']}, transactions=0, random_seed={options['seed']})"
+        )
+        subprocess.run(manage + ["shell", "-c", seed], env=env, check=True, cwd=base_dir)
+
+        for server in ("wsgi", "asgi"):
+            for workers in sorted({1, options["workers"]}):
+                port = _free_port()
+                server_env = dict(
+                    env, ASSOHUB_SERVER=server, ASSOHUB_BIND=f"127.0.0.1:{port}", ASSOHUB_WORKERS=str(workers)
+                )
+                process = subprocess.Popen(
+                    [sys.executable, str(base_dir / "run.py")],
+                    env=server_env,
+                    cwd=base_dir,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+                try:
+                    for name in ("home", "events_list"):
+                        url = f"http://127.0.0.1:{port}{reverse(name)}"
+                        _wait_until_ready(url, process)
+                        results[f"{name} [{server}, {workers} worker]"] = measure_http(
+                            url, options["iterations"], options["concurrency"]
+                        )
+                finally:
+                    process.terminate()
+                    process.wait(timeout=30)
+    return results
+
+
+@contextmanager
+def sqlite_file_database(path: Path, tuned: bool):
+    """Punta temporaneamente il database ``default`` a un file SQLite nuovo.
+
+    Vale solo per le connessioni aperte da ora in poi, quindi va usato da
+    thread nuovi (vedi :func:`in_thread`): la connessione del thread
+    principale resta sul database di test in memoria, che SQLite distrugge
+    alla chiusura.
+    """
+
+    settings_dict = connections.settings[connection.alias]
+    previous = {key: settings_dict.get(key) for key in ("NAME", "CONN_MAX_AGE")}
+    settings_dict.update(NAME=str(path), CONN_MAX_AGE=600 if tuned else 0)
+    try:
+        with override_settings(ASSOHUB_SQLITE_TUNED=tuned):
+            yield
+    finally:
+        settings_dict.update(previous)
+
+
+def in_thread(func: Callable, *args):
+    """Esegue ``func`` in un thread nuovo, con connessioni al database proprie."""
+
+    def run():
+        try:
+            return func(*args)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(run).result()
+
+
+def _registration_worker(user: User, event_ids: List[int]) -> Tuple[int, int]:
+    client = Client(raise_request_exception=True)
+    done = errors = 0
+    try:
+        client.force_login(user)
+        for event_id in event_ids:
+            try:
+                client.get(reverse("event_register", kwargs={"event_id": event_id}))
+                done += 1
+            except OperationalError:  # "database is locked"
+                errors += 1
+    finally:
+        connections.close_all()
+    return done, errors
+
+
+def _prepare_registrations(options: dict) -> Tuple[List[User], List[int]]:
+    call_command("migrate", verbosity=0, interactive=False)
+    seed_association(
+        members=options["concurrency"],
+        events=options["events"],
+        participations_per_event=0,
+        transactions=0,
+        fee_years=0,
+        random_seed=options["seed"],
+    )
+    return list(User.objects.filter(member__isnull=False)), list(Event.objects.values_list("id", flat=True))
+
+
+@scenario("sqlite")
+def sqlite_scenario(options: dict) -> Results:
+    """Iscrizioni simultanee agli eventi su SQLite su file, con il profilo predefinito e con quello ottimizzato.
+
+    ``--concurrency`` utenti diversi si iscrivono in parallelo agli stessi
+    ``--events`` eventi; si contano gli errori "database is locked".
+    """
+
+    if connection.vendor != "sqlite":
+        raise CommandError("Lo scenario sqlite richiede il database SQLite.")
+    results: Results = {}
+    logging.disable(logging.ERROR)  # gli errori attesi sono contati, non stampati da django.request
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for label, tuned in (("predefinito", False), ("ottimizzato", True)):
+                with sqlite_file_database(Path(directory) / f"{label}.sqlite3", tuned):
+                    users, event_ids = in_thread(_prepare_registrations, options)
+                    started = time.perf_counter()
+                    with ThreadPoolExecutor(max_workers=len(users)) as pool:
+                        outcomes = list(pool.map(lambda user: _registration_worker(user, event_ids), users))
+                    elapsed = time.perf_counter() - started
+                done = sum(outcome[0] for outcome in outcomes)
+                results[f"event_register [{label}]"] = {
+                    "registrations": done,
+                    "locked_errors": sum(outcome[1] for outcome in outcomes),
+                    "registrations_per_s": round(done / elapsed, 1),
+                }
+    finally:
+        logging.disable(logging.NOTSET)
+    return results
+
+
+def _register_members(event_id: int, members: List[Member]) -> Tuple[List[float], int]:
+    timings = []
+    errors = 0
+    try:
+        for member in members:
+            started = time.perf_counter()
+            try:
+                register(event_id, member)
+            except OperationalError:
+                errors += 1
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        connections.close_all()
+    return timings, errors
+
+
+def _prepare_popular_event(options: dict) -> Tuple[int, int, List[Member]]:
+    if connection.vendor == "sqlite":
+        call_command("migrate", verbosity=0, interactive=False)
+    seed_association(
+        members=options["members"], users=0, events=0, transactions=0, fee_years=0, random_seed=options["seed"]
+    )
+    capacity = max(1, options["members"] // 2)
+    event = Event.objects.create(
+        title="Evento molto richiesto",
+        date=timezone.now() + timezone.timedelta(days=30),
+        location="Sede",
+        capacity=capacity,
+    )
+    return event.pk, capacity, list(Member.objects.all())
+
+
+def _registration_outcome(event_id: int) -> Tuple[int, int]:
+    confirmed = Participation.objects.filter(event_id=event_id, waitlisted=False).count()
+    return confirmed, Participation.objects.filter(event_id=event_id, waitlisted=True).count()
+
+
+@scenario("registration")
+def registration_scenario(options: dict) -> Results:
+    """``--concurrency`` thread iscrivono tutti gli ``--members`` iscritti a un evento con meta' dei posti.
+
+    Su SQLite usa un file temporaneo con il profilo ottimizzato, perche' il
+    database di test in memoria non e' condivisibile tra thread.
+    """
+
+    def run() -> Results:
+        event_id, capacity, members = in_thread(_prepare_popular_event, options)
+        slices = [members[index::options["concurrency"]] for index in range(options["concurrency"])]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            outcomes = list(pool.map(lambda chunk: _register_members(event_id, chunk), slices))
+        elapsed = time.perf_counter() - started
+        confirmed, waitlisted = in_thread(_registration_outcome, event_id)
+        timings = [value for worker, _ in outcomes for value in worker]
+        p50, p95, p99 = percentiles(timings)
+        return {
+            "event_register [concorrente]": {
+                "capacity": capacity,
+                "confirmed": confirmed,
+                "waitlisted": waitlisted,
+                "oversubscribed": max(0, confirmed - capacity),
+                "errors": sum(errors for _, errors in outcomes),
+                "p50_ms": round(p50, 3),
+                "p95_ms": round(p95, 3),
+                "p99_ms": round(p99, 3),
+                "registrations_per_s": round(len(timings) / elapsed, 1),
+            }
+        }
+
+    if connection.vendor != "sqlite":
+        return run()
+    with tempfile.TemporaryDirectory() as directory:
+        with sqlite_file_database(Path(directory) / "registration.sqlite3", tuned=True):
+            return run()
+
+
+def _per_user(metrics: Dict[str, float], users: int) -> Dict[str, float]:
+    seconds = metrics["elapsed_ms"] / 1000 or 1e-9
+    return {
+        **metrics,
+        "queries_per_user": round(metrics["queries"] / max(users, 1), 2),
+        "users_per_s": round(users / seconds, 1),
+    }
+
+
+@scenario("bulk_users")
+def bulk_users_scenario(options: dict) -> Results:
+    """Creazione, uno alla volta, di un utente per ciascuno degli ``--members`` iscritti e cambi di ruolo.
+
+    Gli utenti passano da ``User.save`` come nel modulo "nuovo iscritto con
+    account", che ne crea uno per richiesta e controlla ogni volta se e' il
+    primo; la seconda misura li crea dentro ``User.bulk_creation()``, che fa
+    il controllo una sola volta. I ruoli cambiano sia dall'utente sia dall'iscritto, come nella
+    pagina di modifica. Il salvataggio di un utente senza modifiche al ruolo
+    non deve toccare l'iscritto.
+    """
+
+    seed_association(
+        members=options["members"], users=0, events=0, transactions=0, fee_years=0, random_seed=options["seed"]
+    )
+    members = list(Member.objects.order_by("pk"))
+    password = make_password(DEFAULT_PASSWORD)  # l'hash non e' il costo da misurare
+
+    def create() -> List[User]:
+        return [
+            User.objects.create(username=f"utente{member.pk}", password=password, member=member, role=member.role)
+            for member in members
+        ]
+
+    def create_in_bulk() -> List[User]:
+        with User.bulk_creation():
+            return create()
+
+    def change_user_roles() -> None:
+        for user in users:
+            user.role = User.ROLE_AMMINISTRATORE
+            user.save()
+
+    def save_users() -> None:
+        for user in users:
+            user.save()
+
+    def change_member_roles() -> None:
+        for member in Member.objects.order_by("pk"):
+            member.role = Member.ROLE_ASSOCIATO
+            member.save(update_fields=["role"])
+
+    users, created = measure_call(create)
+    User.objects.filter(pk__in=[user.pk for user in users]).delete()
+    users, created_in_bulk = measure_call(create_in_bulk)
+    _, promoted = measure_call(change_user_roles)
+    _, unchanged = measure_call(save_users)
+    _, demoted = measure_call(change_member_roles)
+    return {
+        f"crea {len(users)} utenti": _per_user(created, len(users)),
+        f"crea {len(users)} utenti in bulk_creation": _per_user(created_in_bulk, len(users)),
+        "ruolo cambiato dall'utente": _per_user(promoted, len(users)),
+        "utente salvato senza cambi": _per_user(unchanged, len(users)),
+        "ruolo cambiato dall'iscritto": _per_user(demoted, len(users)),
+    }
+
+
+def _seed_ledger(rows: int, years: int, events: List[Event], random_seed: int) -> None:
+    """``rows`` movimenti distribuiti sugli ultimi ``years`` anni, senza indicizzarli per la ricerca."""
+
+    rng = random.Random(random_seed)
+    today = timezone.localdate()
+    span = years * 365
+    batch: List[FinancialTransaction] = []
+    for _ in range(rows):
+        batch.append(
+            FinancialTransaction(
+                transaction_type=rng.choice([FinancialTransaction.TYPE_ENTRATA, FinancialTransaction.TYPE_USCITA]),
+                amount=Decimal(rng.randint(100, 50000)) / 100,
+                date=today - timezone.timedelta(days=rng.randint(0, span)),
+                description="Movimento",
+                event=rng.choice(events) if events and rng.random() > 0.7 else None,
+            )
+        )
+        if len(batch) == 5000:
+            FinancialTransaction.objects.bulk_create(batch)
+            batch = []
+    FinancialTransaction.objects.bulk_create(batch)
+    summaries.rebuild()
+    reports.invalidate()
+
+
+@scenario("reports")
+def reports_scenario(options: dict) -> Results:
+    """Rendiconto su ``--transactions`` movimenti distribuiti su dieci anni (es. ``--transactions 1000000``).
+
+    La prima richiesta calcola tutti gli anni con una query raggruppata; le
+    successive leggono dalla cache gli anni chiusi e ricalcolano solo quello
+    in corso, quindi la loro durata dipende dai movimenti dell'anno aperto.
+    """
+
+    years = 10
+    seed_association(
+        members=0, users=0, events=options["events"], transactions=0, fee_years=0, random_seed=options["seed"]
+    )
+    _seed_ledger(options["transactions"], years, list(Event.objects.all()), options["seed"])
+    last = timezone.localdate().year
+    first = last - years + 1
+    results: Results = {"registro": {"transactions": FinancialTransaction.objects.count()}}
+    for granularity, by_event in (("mese", False), ("trimestre", False), ("anno", False), ("mese", True)):
+        name = f"rendiconto {granularity}{' per evento' if by_event else ''} {first}-{last}"
+        cache.clear()
+        _, cold = measure_call(lambda: build_report(granularity, first, last, by_event=by_event))
+        _, warm = measure_call(lambda: build_report(granularity, first, last, by_event=by_event))
+        results[name] = {
+            "cold_ms": cold["elapsed_ms"],
+            "cold_queries": cold["queries"],
+            "warm_ms": warm["elapsed_ms"],
+            "warm_queries": warm["queries"],
+        }
+    admin, _ = create_accounts()
+    client = Client()
+    client.force_login(admin)
+    url = f"{reverse('financial_report')}?{urlencode({'periodo': 'mese', 'da': first, 'formato': 'json'})}"
+    client.get(url)  # il costo a freddo e' gia' misurato sopra
+    results["financial_report [json]"] = measure_requests(client, "get", url, options["iterations"])
+    return results
@@ -0,0 +1,173 @@
+"""Cache delle pagine pubbliche sugli eventi.
+
+Le liste di eventi e le pagine renderizzate per gli utenti anonimi sono
+salvate nella cache di Django sotto una chiave che contiene una versione.
+I segnali di ``Event`` e ``Participation`` incrementano la versione,
+rendendo obsolete tutte le voci precedenti in un colpo solo; inoltre ogni
+voce scade quando il prossimo evento in programma diventa passato.
+
+Le pagine in cache non devono contenere dati per-utente ne' token CSRF.
+Le funzioni con prefisso ``a`` sono le varianti per le viste asincrone.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from datetime import datetime
+from functools import wraps
+from typing import Callable, Optional
+
+from asgiref.sync import sync_to_async
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+
+from .models import Event
+from .utils import alist
+
+VERSION_KEY = "eventi:versione"
+DEFAULT_TIMEOUT = 300
+PAST_EVENTS_LIMIT = 5
+
+
+def events_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # valore iniziale non riutilizzabile: evita di ritrovare voci di una versione precedente
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump_version() -> None:
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        events_version()
+
+
+def invalidate_events() -> None:
+    """Rende obsolete tutte le voci di cache che dipendono dagli eventi."""
+
+    _bump_version()
+    if transaction.get_connection().in_atomic_block:
+        # una richiesta concorrente potrebbe aver messo in cache i dati precedenti al commit
+        transaction.on_commit(_bump_version)
+
+
+def _timeout(expires: Optional[datetime], now: datetime) -> int:
+    if expires is None:
+        return DEFAULT_TIMEOUT
+    return max(1, min(DEFAULT_TIMEOUT, math.ceil((expires - now).total_seconds())))
+
+
+def _upcoming(now: datetime):
+    return Event.objects.filter(date__gte=now).order_by("date")
+
+
+def _lists_key() -> str:
+    return f"eventi:{events_version()}:liste"
+
+
+def _is_fresh(data: Optional[dict], now: datetime) -> bool:
+    return data is not None and (data["expires"] is None or now < data["expires"])
+
+
+def _lists(upcoming: list, past: list) -> dict:
+    return {"upcoming": upcoming, "past": past, "expires": upcoming[0].date if upcoming else None}
+
+
+def event_lists(now: Optional[datetime] = None) -> dict:
+    """Eventi futuri e ultimi eventi passati, letti dalla cache quando possibile.
+
+    ``expires`` e' la data del prossimo evento: da quel momento le liste
+    (e le pagine che ne dipendono) vanno ricalcolate.
+    """
+
+    now = now or timezone.now()
+    key = _lists_key()
+    data = cache.get(key)
+    if not _is_fresh(data, now):
+        upcoming = list(_upcoming(now))
+        past = list(Event.objects.filter(date__lt=now).order_by("-date")[:PAST_EVENTS_LIMIT])
+        data = _lists(upcoming, past)
+        cache.set(key, data, _timeout(data["expires"], now))
+    return data
+
+
+async def aevent_lists(now: Optional[datetime] = None) -> dict:
+    """Come :func:`event_lists`, per le viste asincrone."""
+
+    now = now or timezone.now()
+    key = _lists_key()
+    data = await cache.aget(key)
+    if not _is_fresh(data, now):
+        upcoming = await alist(_upcoming(now))
+        past = await alist(Event.objects.filter(date__lt=now).order_by("-date")[:PAST_EVENTS_LIMIT])
+        data = _lists(upcoming, past)
+        await cache.aset(key, data, _timeout(data["expires"], now))
+    return data
+
+
+def _page_key(name: str, expires: Optional[datetime]) -> str:
+    boundary = int(expires.timestamp()) if expires else 0
+    return f"pagina:{name}:{events_version()}:{boundary}"
+
+
+def _cacheable(request: HttpRequest) -> bool:
+    # utente e messaggi possono leggere la sessione dal database
+    return request.method == "GET" and not request.user.is_authenticated and not len(get_messages(request))
+
+
+def anonymous_page_cache(name: str) -> Callable:
+    """Serve dalla cache la pagina renderizzata per i visitatori anonimi.
+
+    Funziona sia con viste sincrone sia con viste ``async def``.
+    """
+
+    def decorator(view_func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(view_func):
+            return _async_page_cache(name, view_func)
+
+        @wraps(view_func)
+        def _wrapped_view(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if not _cacheable(request):
+                return view_func(request, *args, **kwargs)
+            now = timezone.now()
+            expires = event_lists(now)["expires"]
+            key = _page_key(name, expires)
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, (response.content, response["Content-Type"]), _timeout(expires, now))
+            return response
+
+        return _wrapped_view
+
+    return decorator
+
+
+def _async_page_cache(name: str, view_func: Callable) -> Callable:
+    @wraps(view_func)
+    async def _wrapped_view(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        if not await sync_to_async(_cacheable)(request):
+            return await view_func(request, *args, **kwargs)
+        now = timezone.now()
+        expires = (await aevent_lists(now))["expires"]
+        key = _page_key(name, expires)
+        cached = await cache.aget(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        response = await view_func(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            await cache.aset(key, (response.content, response["Content-Type"]), _timeout(expires, now))
+        return response
+
+    return _wrapped_view
@@ -0,0 +1,38 @@
+"""Profilo SQLite ottimizzato per l'accesso concorrente.
+
+Attivo con ``ASSOHUB_SQLITE_TUNED=1``: ogni nuova connessione SQLite passa
+in modalita' WAL (i lettori non vengono bloccati da chi scrive), attende
+fino a ``busy_timeout`` millisecondi invece di fallire subito con
+"database is locked" e usa una cache di pagine e una mappatura in memoria
+piu' grandi. ``synchronous=NORMAL`` e' sicuro in modalita' WAL: in caso di
+interruzione di corrente si perdono al massimo le ultime transazioni, senza
+corrompere il database.
+"""
+from __future__ import annotations
+
+from typing import Dict
+
+from django.conf import settings
+
+PRAGMAS: Dict[str, object] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 20000,  # millisecondi
+    "cache_size": -64000,  # valori negativi sono KiB: 64 MB
+    "mmap_size": 268435456,  # 256 MB
+    "temp_store": "MEMORY",
+}
+
+
+def sqlite_pragmas() -> Dict[str, object]:
+    return {**PRAGMAS, **getattr(settings, "ASSOHUB_SQLITE_PRAGMAS", {})}
+
+
+def tune_sqlite(sender, connection, **kwargs) -> None:
+    """Ricevitore di ``connection_created`` che applica :data:`PRAGMAS`."""
+
+    if connection.vendor != "sqlite" or not getattr(settings, "ASSOHUB_SQLITE_TUNED", False):
+        return
+    with connection.cursor() as cursor:
+        for name, value in sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {name} = {value}")
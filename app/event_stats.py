@@ -0,0 +1,93 @@
+"""Contatori denormalizzati di ogni evento.
+
+Iscritti confermati, iscritti in lista d'attesa e presenti di
+:class:`~app.models.Event` sono aggiornati con incrementi atomici dai
+segnali di ``Participation``; le operazioni massive, che non inviano
+segnali, usano :func:`apply_delta` oppure :func:`refresh`, un unico
+``UPDATE`` con sottoquery. Elenco eventi, dashboard e admin mostrano cosi'
+iscrizioni e affluenza senza contare le partecipazioni di ogni evento.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+from django.db.models import Count, F, OuterRef, Q, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Event, Participation
+
+STAT_FIELDS = Event.STAT_FIELDS
+
+
+def participation_stats(waitlisted: bool, presence: bool) -> Dict[str, int]:
+    """Contributo di una partecipazione ai contatori del suo evento."""
+
+    if waitlisted:
+        return {"participants_count": 0, "waitlist_count": 1, "present_count": 0}
+    return {"participants_count": 1, "waitlist_count": 0, "present_count": 1 if presence else 0}
+
+
+def apply_delta(events, **deltas) -> None:
+    """Somma ``deltas`` ai contatori di ``events`` (un ID o un queryset) con un solo UPDATE."""
+
+    changes = {name: F(name) + value for name, value in deltas.items() if value}
+    if not changes:
+        return
+    queryset = events if isinstance(events, QuerySet) else Event.objects.filter(pk=events)
+    queryset.update(**changes)
+
+
+def transfer(
+    before_event: Optional[int], before: Dict[str, int], after_event: Optional[int], after: Dict[str, int]
+) -> None:
+    """Sposta il contributo di una partecipazione da ``before_event`` ad ``after_event``.
+
+    Come :func:`app.member_stats.transfer`: ``None`` indica una riga nuova o eliminata.
+    """
+
+    if before_event == after_event:
+        apply_delta(after_event, **{name: after[name] - before[name] for name in after})
+        return
+    if before_event is not None:
+        apply_delta(before_event, **{name: -value for name, value in before.items()})
+    if after_event is not None:
+        apply_delta(after_event, **after)
+
+
+def _count(queryset: QuerySet) -> Coalesce:
+    rows = queryset.filter(event=OuterRef("pk")).order_by().values("event").annotate(value=Count("id"))
+    return Coalesce(Subquery(rows.values("value")), 0)
+
+
+def stat_expressions(participation_model=Participation) -> Dict[str, object]:
+    """Espressioni che ricalcolano i contatori dalle partecipazioni (usate anche dalle migrazioni)."""
+
+    confirmed = participation_model.objects.filter(waitlisted=False)
+    return {
+        "participants_count": _count(confirmed),
+        "waitlist_count": _count(participation_model.objects.filter(waitlisted=True)),
+        "present_count": _count(confirmed.filter(presence=True)),
+    }
+
+
+def refresh(events: Optional[QuerySet] = None) -> int:
+    """Ricalcola i contatori di ``events`` (tutti gli eventi se ``None``) con un unico UPDATE."""
+
+    queryset = Event.objects.all() if events is None else events
+    return queryset.update(**stat_expressions())
+
+
+def check() -> List[str]:
+    """Eventi i cui contatori non corrispondono a quelli ricalcolati."""
+
+    live = {f"live_{name}": expression for name, expression in stat_expressions().items()}
+    mismatch = Q()
+    for name in STAT_FIELDS:
+        mismatch |= ~Q(**{name: F(f"live_{name}")})
+    rows = Event.objects.annotate(**live).filter(mismatch).order_by("pk")
+    differences = []
+    for event in rows:
+        stored = ", ".join(f"{name}={getattr(event, name)}" for name in STAT_FIELDS)
+        expected = ", ".join(f"{name}={getattr(event, f'live_{name}')}" for name in STAT_FIELDS)
+        differences.append(f"{event.title} ({event.date:%d/%m/%Y}): {stored} (atteso {expected})")
+    return differences
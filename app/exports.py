@@ -0,0 +1,144 @@
+"""Esportazioni CSV in streaming di iscritti, quote, partecipazioni e movimenti.
+
+Le righe sono lette con ``values_list().iterator()`` e scritte una alla
+volta, quindi la memoria usata non dipende dalla dimensione della tabella.
+I generatori sono usati sia dalla vista ``export_csv`` sia dal comando
+``manage.py export_csv``; i parametri sono quelli delle pagine elenco, che
+passano all'esportazione la propria query string.
+"""
+from __future__ import annotations
+
+import csv
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, Iterator, Mapping, Sequence
+
+from django.db.models import QuerySet
+from django.utils.dateparse import parse_date
+
+from .forms import MemberSearchForm
+from .models import FinancialTransaction, MembershipFee, Participation
+
+CHUNK_SIZE = 2000
+
+
+@dataclass(frozen=True)
+class Export:
+    header: Sequence[str]
+    fields: Sequence[str]
+    queryset: Callable[[Mapping[str, str]], QuerySet]
+
+
+def _flag(value: str) -> bool:
+    return value.lower() in {"1", "si", "true"}
+
+
+def _date(value: str | None) -> date | None:
+    try:
+        return parse_date(value or "")
+    except ValueError:
+        return None
+
+
+def members_queryset(params: Mapping[str, str]) -> QuerySet:
+    # stessi filtri e ordinamento dell'elenco iscritti (q, ruolo, stato, morosi, ordina)
+    queryset, ordering = MemberSearchForm(params).results()
+    return queryset.order_by(*ordering)
+
+
+def fees_queryset(params: Mapping[str, str]) -> QuerySet:
+    queryset = MembershipFee.objects.order_by("-year", "member__last_name", "id")
+    if params.get("anno", "").isdigit():
+        queryset = queryset.filter(year=int(params["anno"]))
+    if params.get("stato"):
+        queryset = queryset.filter(status=params["stato"])
+    if params.get("iscritto", "").isdigit():
+        queryset = queryset.filter(member_id=int(params["iscritto"]))
+    return queryset
+
+
+def participations_queryset(params: Mapping[str, str]) -> QuerySet:
+    queryset = Participation.objects.order_by("event__date", "id")
+    if params.get("evento", "").isdigit():
+        queryset = queryset.filter(event_id=int(params["evento"]))
+    if params.get("presenza"):
+        queryset = queryset.filter(presence=_flag(params["presenza"]))
+    return queryset
+
+
+def transactions_queryset(params: Mapping[str, str]) -> QuerySet:
+    queryset = FinancialTransaction.objects.order_by("-date", "-id")
+    if params.get("tipo"):
+        queryset = queryset.filter(transaction_type=params["tipo"])
+    start = _date(params.get("dal"))
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    end = _date(params.get("al"))
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    return queryset
+
+
+EXPORTS: Dict[str, Export] = {
+    "iscritti": Export(
+        header=["ID", "Nome", "Cognome", "Email", "Telefono", "Ruolo", "Attivo"],
+        fields=["id", "first_name", "last_name", "email", "phone", "role", "active"],
+        queryset=members_queryset,
+    ),
+    "quote": Export(
+        header=["ID", "ID iscritto", "Nome", "Cognome", "Anno", "Importo", "Stato", "Data pagamento"],
+        fields=[
+            "id",
+            "member_id",
+            "member__first_name",
+            "member__last_name",
+            "year",
+            "amount",
+            "status",
+            "payment_date",
+        ],
+        queryset=fees_queryset,
+    ),
+    "partecipazioni": Export(
+        header=["ID", "Evento", "Data evento", "ID iscritto", "Nome", "Cognome", "Presenza", "Registrata il"],
+        fields=[
+            "id",
+            "event__title",
+            "event__date",
+            "member_id",
+            "member__first_name",
+            "member__last_name",
+            "presence",
+            "registered_at",
+        ],
+        queryset=participations_queryset,
+    ),
+    "movimenti": Export(
+        header=["ID", "Data", "Tipo", "Importo", "Descrizione", "Evento"],
+        fields=["id", "date", "transaction_type", "amount", "description", "event__title"],
+        queryset=transactions_queryset,
+    ),
+}
+
+
+def export_rows(kind: str, params: Mapping[str, str] | None = None) -> Iterator[Sequence[object]]:
+    """Intestazione e righe dell'esportazione ``kind``."""
+
+    export = EXPORTS[kind]
+    yield export.header
+    queryset = export.queryset(params or {}).values_list(*export.fields)
+    for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+        yield ["si" if value is True else "no" if value is False else value for value in row]
+
+
+class _Echo:
+    def write(self, value: str) -> str:
+        return value
+
+
+def csv_lines(rows: Iterator[Sequence[object]]) -> Iterator[str]:
+    """Converte le righe in testo CSV, una riga per volta."""
+
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row)
@@ -0,0 +1,57 @@
+"""Generazione annuale delle quote associative."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from . import member_stats, summaries
+from .models import Member, MembershipFee
+
+BATCH_SIZE = 1000
+
+
+@dataclass
+class CampaignResult:
+    year: int
+    amount: Decimal
+    missing: int
+    created: int = 0
+    dry_run: bool = False
+
+
+def generate_fees(year: int, amount: Decimal, dry_run: bool = False) -> CampaignResult:
+    """Crea una quota pendente per ogni iscritto attivo che non ne ha una per ``year``.
+
+    Gli iscritti da fatturare sono individuati con un'unica query; le quote
+    sono inserite con ``bulk_create(ignore_conflicts=True)``, quindi eventuali
+    quote create nel frattempo non violano ``unique_fee_per_member_year``.
+    Il riepilogo delle quote viene ricalcolato con
+    :func:`~app.summaries.refresh_fee_figures` invece di sommare le quote
+    create, che non si distinguono da quelle salvate in parallelo.
+    """
+
+    missing = Member.objects.filter(active=True).exclude(
+        Exists(MembershipFee.objects.filter(member=OuterRef("pk"), year=year))
+    )
+    if dry_run:
+        return CampaignResult(year=year, amount=amount, missing=missing.count(), dry_run=True)
+
+    with transaction.atomic():
+        member_ids = list(missing.order_by().values_list("id", flat=True))
+        before = MembershipFee.objects.filter(year=year).count()
+        MembershipFee.objects.bulk_create(
+            (MembershipFee(member_id=member_id, year=year, amount=amount) for member_id in member_ids),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        # indicativo: comprende anche le quote dell'anno registrate nel frattempo da altre richieste
+        created = MembershipFee.objects.filter(year=year).count() - before
+        # bulk_create non invia segnali: il riepilogo delle quote e le statistiche degli iscritti si ricalcolano,
+        # perche' le quote salvate nel frattempo hanno gia' applicato il proprio incremento
+        summaries.refresh_fee_figures()
+        if created:
+            member_stats.refresh(Member.objects.filter(fees__year=year))
+    return CampaignResult(year=year, amount=amount, missing=len(member_ids), created=created)
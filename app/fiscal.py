@@ -0,0 +1,187 @@
+"""Chiusura degli esercizi e fotografie immutabili del registro.
+
+Chiudere un esercizio scrive una :class:`~app.models.FiscalYearClosing`
+con il saldo di apertura, i totali dell'anno e i progressivi dall'inizio
+del registro. Da quel momento i movimenti con data fino al 31 dicembre
+dell'esercizio non si possono piu' creare, modificare o eliminare (i
+segnali chiamano :func:`ensure_open`), quindi saldi e totali si ottengono
+dall'ultima chiusura piu' i soli movimenti del periodo aperto, invece di
+riaggregare tutto il registro.
+
+Gli esercizi si chiudono in ordine; il primo puo' essere qualunque anno
+gia' terminato e riassume anche tutti i movimenti precedenti.
+:func:`verify` ricalcola un esercizio chiuso e lo confronta con la sua
+fotografia.
+
+Chiusura e scritture sul registro si escludono a vicenda: ogni scrittura
+controlla l'esercizio nella propria transazione tenendo un lock condiviso
+(:func:`lock_ledger`), la chiusura prende lo stesso lock in modo esclusivo,
+quindi attende le scritture in corso e blocca le successive fino al commit
+della fotografia. Su PostgreSQL e' un advisory lock; SQLite ammette un solo
+scrittore alla volta e fa fallire la transazione che ha letto dati nel
+frattempo modificati, invece di lasciarle scrivere.
+"""
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, QuerySet, Sum
+from django.utils import timezone
+
+from .models import FinancialTransaction, FiscalYearClosing
+
+ZERO = Decimal("0")
+CENT = Decimal("0.01")
+INCOME = Q(transaction_type=FinancialTransaction.TYPE_ENTRATA)
+EXPENSE = Q(transaction_type=FinancialTransaction.TYPE_USCITA)
+LEDGER_LOCK = 250_101  # chiave dell'advisory lock del registro su PostgreSQL
+
+
+class ClosedYearError(Exception):
+    """Operazione su un esercizio chiuso o chiusura non consentita."""
+
+
+def lock_ledger(exclusive: bool = False) -> None:
+    """Lock del registro fino alla fine della transazione corrente (condiviso per le scritture)."""
+
+    if connection.vendor != "postgresql" or not connection.in_atomic_block:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT pg_advisory_xact_lock{'' if exclusive else '_shared'}(%s)", [LEDGER_LOCK])
+
+
+def latest_closing() -> Optional[FiscalYearClosing]:
+    """Ultimo esercizio chiuso (una query sull'indice univoco dell'anno)."""
+
+    return FiscalYearClosing.objects.order_by("-year").first()
+
+
+def open_transactions(closing: Optional[FiscalYearClosing] = None) -> QuerySet:
+    """Movimenti del periodo aperto, cioe' successivi all'ultima chiusura."""
+
+    queryset = FinancialTransaction.objects.all()
+    return queryset.filter(date__gt=closing.end) if closing else queryset
+
+
+def _as_date(value) -> date:
+    # il default del campo e' timezone.now, quindi un datetime
+    return FinancialTransaction._meta.get_field("date").to_python(value)
+
+
+def ensure_open(dates: Iterable, closing: Optional[FiscalYearClosing] = None) -> None:
+    """Solleva :class:`ClosedYearError` se una delle date cade in un esercizio chiuso."""
+
+    dates = [_as_date(value) for value in dates if value is not None]
+    if not dates:
+        return
+    closing = closing or latest_closing()
+    if closing and min(dates) <= closing.end:
+        raise ClosedYearError(
+            f"L'esercizio {min(dates).year} e' chiuso: i movimenti fino al {closing.end:%d/%m/%Y} non si modificano."
+        )
+
+
+def guard(dates: Iterable) -> None:
+    """Come :func:`ensure_open`, ma all'interno della transazione di una scrittura sul registro."""
+
+    lock_ledger()
+    ensure_open(dates)
+
+
+def ensure_event_deletable(event_id: int) -> None:
+    """Eliminare un evento scollega i suoi movimenti: vietato se qualcuno e' in un esercizio chiuso."""
+
+    lock_ledger()
+    closing = latest_closing()
+    if closing and FinancialTransaction.objects.filter(event_id=event_id, date__lte=closing.end).exists():
+        raise ClosedYearError(
+            f"L'evento ha movimenti in esercizi chiusi (fino al {closing.end:%d/%m/%Y}) e non si puo' eliminare."
+        )
+
+
+def figures(queryset: QuerySet) -> Dict[str, object]:
+    """Entrate, uscite e numero di movimenti per tipo con un'unica aggregazione condizionale."""
+
+    values = queryset.order_by().aggregate(
+        income=Sum("amount", filter=INCOME, default=ZERO),
+        expense=Sum("amount", filter=EXPENSE, default=ZERO),
+        income_count=Count("id", filter=INCOME),
+        expense_count=Count("id", filter=EXPENSE),
+    )
+    # SQLite restituisce le somme senza scala
+    values["income"], values["expense"] = values["income"].quantize(CENT), values["expense"].quantize(CENT)
+    return values
+
+
+def _year_queryset(year: int) -> QuerySet:
+    return FinancialTransaction.objects.filter(date__gte=date(year, 1, 1), date__lte=date(year, 12, 31))
+
+
+def _expected(year: int, previous: Optional[FiscalYearClosing]) -> Dict[str, object]:
+    """Valori della fotografia di ``year`` ricalcolati dal registro."""
+
+    if previous is None:
+        # primo esercizio chiuso: riassume anche tutto cio' che lo precede
+        before = figures(FinancialTransaction.objects.filter(date__lt=date(year, 1, 1)))
+    else:
+        before = {
+            "income": previous.total_income,
+            "expense": previous.total_expense,
+            "income_count": previous.total_income_count,
+            "expense_count": previous.total_expense_count,
+        }
+    current = figures(_year_queryset(year))
+    return {
+        "opening_balance": before["income"] - before["expense"],
+        "income": current["income"],
+        "expense": current["expense"],
+        "income_count": current["income_count"],
+        "expense_count": current["expense_count"],
+        "total_income": before["income"] + current["income"],
+        "total_expense": before["expense"] + current["expense"],
+        "total_income_count": before["income_count"] + current["income_count"],
+        "total_expense_count": before["expense_count"] + current["expense_count"],
+    }
+
+
+@transaction.atomic
+def close_year(year: int, today: Optional[date] = None) -> FiscalYearClosing:
+    """Chiude ``year`` scrivendone la fotografia; gli esercizi vanno chiusi in ordine."""
+
+    today = today or timezone.localdate()
+    if year >= today.year:
+        raise ClosedYearError(f"L'esercizio {year} non e' ancora terminato.")
+    lock_ledger(exclusive=True)  # attende le scritture in corso e blocca le nuove fino al commit
+    previous = FiscalYearClosing.objects.select_for_update().order_by("-year").first()
+    if previous and year <= previous.year:
+        raise ClosedYearError(f"L'esercizio {year} e' gia' chiuso.")
+    if previous and year != previous.year + 1:
+        raise ClosedYearError(f"Prima del {year} va chiuso l'esercizio {previous.year + 1}.")
+    return FiscalYearClosing.objects.create(year=year, **_expected(year, previous))
+
+
+def verify(closing: FiscalYearClosing) -> List[str]:
+    """Ricalcola l'esercizio chiuso e restituisce le differenze rispetto alla fotografia."""
+
+    previous = FiscalYearClosing.objects.filter(year__lt=closing.year).order_by("-year").first()
+    differences = []
+    for name, expected in _expected(closing.year, previous).items():
+        stored = getattr(closing, name)
+        if stored != expected:
+            differences.append(f"{closing.year} {name}: registrato {stored}, atteso {expected}")
+    return differences
+
+
+def check(years: Optional[Iterable[int]] = None) -> List[str]:
+    """Verifica le chiusure indicate (tutte se ``None``)."""
+
+    closings = FiscalYearClosing.objects.order_by("year")
+    if years is not None:
+        closings = closings.filter(year__in=list(years))
+    differences = []
+    for closing in closings:
+        differences += verify(closing)
+    return differences
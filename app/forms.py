@@ -1,11 +1,16 @@
 from __future__ import annotations
 
-from typing import List
+from typing import List, Tuple
 
 from django import forms
 from django.contrib.auth.forms import AuthenticationForm, PasswordChangeForm
+from django.db.models import ExpressionWrapper, F, FloatField, QuerySet
+from django.db.models.functions import Coalesce, NullIf
 
-from .models import Event, FinancialTransaction, Member, MembershipFee, Participation, User
+from . import fiscal
+from .models import Event, FinancialTransaction, Member, MembershipFee, Participation, User, normalize_search
+from .reports import GRANULARITY_CHOICES
+from .utils import prefix_filter
 
 
 class BootstrapFormMixin:
@@ -80,6 +85,119 @@ class MemberUserForm(MemberForm):
         return member
 
 
+class MemberSearchForm(BootstrapFormMixin, forms.Form):
+    ORDER_CHOICES = [
+        ("nome", "Nome"),
+        ("arretrati", "Arretrati"),
+        ("frequentati", "Eventi frequentati"),
+        ("presenze", "Tasso di presenza"),
+    ]
+
+    q = forms.CharField(
+        label="Cerca",
+        required=False,
+        max_length=100,
+        widget=forms.TextInput(attrs={"placeholder": "Cognome, nome o email", "type": "search"}),
+    )
+    ruolo = forms.ChoiceField(label="Ruolo", required=False, choices=[("", "Tutti")] + Member.ROLE_CHOICES)
+    stato = forms.ChoiceField(
+        label="Stato", required=False, choices=[("", "Tutti"), ("1", "Attivi"), ("0", "Inattivi")]
+    )
+    ordina = forms.ChoiceField(label="Ordina per", required=False, choices=ORDER_CHOICES)
+    morosi = forms.BooleanField(label="Solo con quote arretrate", required=False)
+
+    # con l'id come ultima colonna per la paginazione a cursore
+    ORDERINGS = {
+        "nome": ("last_name", "first_name", "id"),
+        "arretrati": ("-arrears", "last_name", "first_name", "id"),
+        "frequentati": ("-events_attended", "last_name", "first_name", "id"),
+        "presenze": ("-attendance", "last_name", "first_name", "id"),
+    }
+
+    def results(self) -> Tuple[QuerySet, Tuple[str, ...]]:
+        """Iscritti filtrati come nell'elenco e ordinamento scelto; i filtri non validi sono ignorati.
+
+        Usato sia dall'elenco iscritti sia dalla sua esportazione CSV.
+        """
+
+        filters = self.cleaned_data if self.is_valid() else {}
+        members = search_members(Member.objects.all(), filters.get("q", ""))
+        if filters.get("ruolo"):
+            members = members.filter(role=filters["ruolo"])
+        if filters.get("stato"):
+            members = members.filter(active=filters["stato"] == "1")
+        if filters.get("morosi"):
+            members = members.filter(arrears__gt=0)
+        sort = filters.get("ordina") or "nome"
+        if sort == "presenze":
+            # -1 per chi non e' iscritto ad alcun evento: il cursore non gestisce i valori nulli
+            rate = ExpressionWrapper(
+                F("events_attended") * 1.0 / NullIf(F("events_registered"), 0), output_field=FloatField()
+            )
+            members = members.annotate(attendance=Coalesce(rate, -1.0))
+        return members, self.ORDERINGS[sort]
+
+
+def search_members(members: QuerySet, text: str) -> QuerySet:
+    """Ricerca per prefisso su "cognome nome", "nome cognome" ed email, tramite le colonne normalizzate."""
+
+    key = normalize_search(text)
+    if not key:
+        return members
+    condition = prefix_filter("search_name", key) | prefix_filter("search_email", key)
+    words = key.split()
+    if len(words) > 1:  # "mario rossi" -> "rossi mario"
+        condition |= prefix_filter("search_name", " ".join(words[-1:] + words[:-1]))
+    return members.filter(condition)
+
+
+class MemberImportUploadForm(BootstrapFormMixin, forms.Form):
+    file = forms.FileField(label="File CSV o XLSX")
+    password = forms.CharField(
+        label="Password iniziale",
+        required=False,
+        widget=forms.PasswordInput,
+        help_text="Comune a tutti gli utenti importati; se vuota l'accesso resta disabilitato.",
+    )
+
+
+class FeeCampaignForm(BootstrapFormMixin, forms.Form):
+    year = forms.IntegerField(label="Anno", min_value=1900, max_value=9999)
+    amount = forms.DecimalField(label="Importo", max_digits=10, decimal_places=2, min_value=0)
+    dry_run = forms.BooleanField(
+        label="Solo simulazione",
+        required=False,
+        help_text="Conta le quote da creare senza registrarle.",
+    )
+
+
+class FinancialReportForm(BootstrapFormMixin, forms.Form):
+    MAX_YEARS = 50
+
+    periodo = forms.ChoiceField(label="Raggruppa per", required=False, choices=GRANULARITY_CHOICES)
+    da = forms.IntegerField(label="Dall'anno", required=False, min_value=1900, max_value=9999)
+    a = forms.IntegerField(label="All'anno", required=False, min_value=1900, max_value=9999)
+    per_evento = forms.BooleanField(label="Dettaglio per evento", required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        first, last = cleaned_data.get("da"), cleaned_data.get("a")
+        if first and last and first > last:
+            raise forms.ValidationError("L'anno iniziale deve precedere quello finale.")
+        if first and last and last - first >= self.MAX_YEARS:
+            raise forms.ValidationError(f"Il rendiconto copre al massimo {self.MAX_YEARS} anni.")
+        return cleaned_data
+
+
+class StatementUploadForm(BootstrapFormMixin, forms.Form):
+    file = forms.FileField(label="Estratto conto (CSV o XML CAMT.053)")
+    dry_run = forms.BooleanField(
+        label="Solo anteprima",
+        required=False,
+        help_text="Mostra gli abbinamenti senza registrare i pagamenti.",
+    )
+
+
 class EventForm(BootstrapFormMixin, forms.ModelForm):
     date = forms.DateTimeField(
         label="Data e ora",
@@ -88,7 +206,7 @@ class EventForm(BootstrapFormMixin, forms.ModelForm):
 
     class Meta:
         model = Event
-        fields = ["title", "description", "date", "location"]
+        fields = ["title", "description", "date", "location", "capacity"]
         labels = {
             "title": "Titolo",
             "description": "Descrizione",
@@ -139,6 +257,14 @@ class FinancialTransactionForm(BootstrapFormMixin, forms.ModelForm):
             "event": "Evento collegato",
         }
 
+    def clean_date(self):
+        value = self.cleaned_data["date"]
+        try:
+            fiscal.ensure_open([value, self.instance.date if self.instance.pk else None])
+        except fiscal.ClosedYearError as exc:
+            raise forms.ValidationError(str(exc)) from exc
+        return value
+
 
 class UserProfileForm(BootstrapFormMixin, forms.Form):
     username = forms.CharField(label="Nome utente", max_length=150)
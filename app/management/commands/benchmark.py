@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import json
+import platform
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from app.benchmarks import SCENARIOS, compare
+
+PARAMETERS = (
+    "members",
+    "users",
+    "events",
+    "participations",
+    "transactions",
+    "iterations",
+    "concurrency",
+    "workers",
+    "seed",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Popola un database di test con dati sintetici, esegue uno scenario di benchmark "
+        "e salva i risultati in JSON per confrontarli tra commit diversi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="views")
+        parser.add_argument("--members", type=int, default=1000, help="Iscritti da generare.")
+        parser.add_argument("--users", type=int, default=None, help="Utenti da generare (default: uno per iscritto).")
+        parser.add_argument("--events", type=int, default=100, help="Eventi da generare.")
+        parser.add_argument("--participations", type=int, default=20, help="Partecipazioni per evento.")
+        parser.add_argument("--transactions", type=int, default=5000, help="Movimenti da generare.")
+        parser.add_argument("--iterations", type=int, default=30, help="Richieste per misura.")
+        parser.add_argument("--concurrency", type=int, default=8, help="Client concorrenti (scenario asgi).")
+        parser.add_argument("--workers", type=int, default=4, help="Worker del server (scenario server).")
+        parser.add_argument("--seed", type=int, default=0, help="Seme del generatore casuale.")
+        parser.add_argument("--output", type=Path, help="File JSON in cui salvare i risultati.")
+        parser.add_argument("--baseline", type=Path, help="Risultati JSON di riferimento da confrontare.")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=1.2,
+            help="Peggioramento massimo tollerato rispetto al riferimento (1.2 = +20%%).",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            try:
+                baseline = json.loads(options["baseline"].read_text())
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Impossibile leggere il riferimento: {exc}") from exc
+
+        # il benchmark lavora sempre su un database di test usa e getta
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(ALLOWED_HOSTS=["testserver", "localhost"]):
+                results = SCENARIOS[options["scenario"]](options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            "scenario": options["scenario"],
+            "created": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "parameters": {key: options[key] for key in PARAMETERS},
+            "results": results,
+        }
+        for name, metrics in results.items():
+            values = ", ".join(f"{metric}={value}" for metric, value in metrics.items())
+            self.stdout.write(f"{name}: {values}")
+        if options["output"]:
+            options["output"].write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Risultati salvati in {options['output']}")
+
+        if baseline is not None:
+            regressions = compare(results, baseline.get("results", {}), options["threshold"])
+            if regressions:
+                raise CommandError("Regressioni rispetto al riferimento:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("Nessuna regressione rispetto al riferimento."))
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import fiscal
+
+
+class Command(BaseCommand):
+    help = "Chiude un esercizio scrivendone la fotografia immutabile e verifica le chiusure esistenti."
+
+    def add_arguments(self, parser):
+        parser.add_argument("year", nargs="?", type=int, help="Esercizio da chiudere.")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Ricalcola l'esercizio indicato (o tutti quelli chiusi) e lo confronta con la fotografia.",
+        )
+
+    def handle(self, *args, **options):
+        year = options["year"]
+        if not options["check"]:
+            if year is None:
+                raise CommandError("Indica l'esercizio da chiudere.")
+            try:
+                closing = fiscal.close_year(year)
+            except fiscal.ClosedYearError as exc:
+                raise CommandError(str(exc)) from exc
+            self.stdout.write(
+                f"Esercizio {closing.year}: apertura {closing.opening_balance} €, entrate {closing.income} €, "
+                f"uscite {closing.expense} €, chiusura {closing.closing_balance} €"
+            )
+        differences = fiscal.check([year] if year is not None else None)
+        if differences:
+            raise CommandError("Chiusure non allineate al registro:\n" + "\n".join(differences))
+        self.stdout.write(self.style.SUCCESS("Chiusure d'esercizio allineate al registro."))
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.exports import EXPORTS, csv_lines, export_rows
+
+
+class Command(BaseCommand):
+    help = "Esporta in CSV iscritti, quote, partecipazioni o movimenti (utile per backup programmati)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(EXPORTS))
+        parser.add_argument("--output", type=Path, help="File di destinazione (default: standard output).")
+        parser.add_argument(
+            "--filter",
+            action="append",
+            default=[],
+            metavar="CHIAVE=VALORE",
+            help="Filtro come nei parametri della pagina, ad esempio --filter anno=2024.",
+        )
+
+    def handle(self, *args, **options):
+        params = {}
+        for item in options["filter"]:
+            key, separator, value = item.partition("=")
+            if not separator:
+                raise CommandError(f"Filtro non valido: {item}")
+            params[key] = value
+
+        lines = csv_lines(export_rows(options["kind"], params))
+        if options["output"] is None:
+            sys.stdout.writelines(lines)
+            return
+        with options["output"].open("w", encoding="utf-8", newline="") as file:
+            file.writelines(lines)
+        self.stderr.write(self.style.SUCCESS(f"Esportazione salvata in {options['output']}"))
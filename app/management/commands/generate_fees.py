@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app.fee_campaigns import generate_fees
+
+
+class Command(BaseCommand):
+    help = "Crea le quote pendenti dell'anno per tutti gli iscritti attivi che non ne hanno una."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, default=timezone.now().year, help="Anno delle quote.")
+        parser.add_argument("--amount", required=True, help="Importo di ogni quota, ad esempio 30.00.")
+        parser.add_argument("--dry-run", action="store_true", help="Mostra i conteggi senza creare quote.")
+
+    def handle(self, *args, **options):
+        try:
+            amount = Decimal(options["amount"])
+        except InvalidOperation as exc:
+            raise CommandError(f"Importo non valido: {options['amount']}") from exc
+        if amount < 0:
+            raise CommandError("L'importo non puo' essere negativo.")
+
+        result = generate_fees(options["year"], amount, dry_run=options["dry_run"])
+        if result.dry_run:
+            self.stdout.write(f"Quote da creare per il {result.year}: {result.missing}.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Create {result.created} quote per il {result.year}."))
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.member_import import DEFAULT_BATCH_SIZE, ImportFileError, import_members, read_rows
+
+
+class Command(BaseCommand):
+    help = "Importa iscritti (e relativi utenti) da un file CSV o XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", type=Path, help="File CSV o XLSX con intestazione.")
+        parser.add_argument("--password", help="Password iniziale comune per gli utenti importati.")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path: Path = options["file"]
+        try:
+            with path.open("rb") as file:
+                result = import_members(
+                    read_rows(file, path.name), password=options["password"], batch_size=options["batch_size"]
+                )
+        except OSError as exc:
+            raise CommandError(f"Impossibile leggere {path}: {exc}") from exc
+        except ImportFileError as exc:
+            raise CommandError(str(exc)) from exc
+
+        for line, message in result.errors:
+            self.stderr.write(f"Riga {line}: {message}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Importati {result.created} iscritti e {result.users_created} utenti; "
+                f"{len(result.errors)} righe scartate."
+            )
+        )
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import event_stats
+
+
+class Command(BaseCommand):
+    help = "Ricalcola in un solo passaggio iscritti, lista d'attesa e presenti di tutti gli eventi."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Verifica soltanto i contatori senza ricalcolarli.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["check"]:
+            updated = event_stats.refresh()
+            self.stdout.write(f"Contatori ricalcolati per {updated} eventi.")
+        differences = event_stats.check()
+        if differences:
+            raise CommandError("Contatori non allineati:\n" + "\n".join(differences))
+        self.stdout.write(self.style.SUCCESS("Contatori degli eventi allineati ai dati reali."))
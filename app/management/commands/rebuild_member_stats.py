@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import member_stats
+
+
+class Command(BaseCommand):
+    help = "Ricalcola in un solo passaggio le statistiche denormalizzate di tutti gli iscritti."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Verifica soltanto le statistiche senza ricalcolarle.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["check"]:
+            updated = member_stats.refresh()
+            self.stdout.write(f"Statistiche ricalcolate per {updated} iscritti.")
+        differences = member_stats.check()
+        if differences:
+            raise CommandError("Statistiche non allineate:\n" + "\n".join(differences))
+        self.stdout.write(self.style.SUCCESS("Statistiche degli iscritti allineate ai dati reali."))
@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from app import search
+
+
+class Command(BaseCommand):
+    help = "Ricostruisce da zero l'indice della ricerca globale su iscritti, eventi e movimenti."
+
+    def handle(self, *args, **options):
+        counts = search.rebuild()
+        for kind, count in counts.items():
+            self.stdout.write(f"{kind}: {count} documenti")
+        self.stdout.write(self.style.SUCCESS(f"Indice di ricerca ricostruito (motore: {search.backend()})."))
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import summaries
+
+
+class Command(BaseCommand):
+    help = "Ricostruisce il riepilogo finanziario della dashboard e lo verifica con gli aggregati reali."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Verifica soltanto il riepilogo senza ricostruirlo.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["check"]:
+            figures = summaries.rebuild()
+            for key, (count, total) in figures.items():
+                self.stdout.write(f"{key}: {count} / {total} €")
+        differences = summaries.check()
+        if differences:
+            raise CommandError("Riepilogo non allineato:\n" + "\n".join(differences))
+        self.stdout.write(self.style.SUCCESS("Riepilogo allineato agli aggregati reali."))
@@ -0,0 +1,212 @@
+"""Importazione massiva degli iscritti da file CSV o XLSX.
+
+Le righe vengono lette in streaming e validate con le regole di
+:class:`MemberForm`; l'unicita' di email e nome utente e' verificata con
+una sola query per lotto e gli inserimenti usano ``bulk_create``.
+L'importazione e' un'unica transazione: un errore nel file (per esempio una
+codifica diversa da UTF-8 a meta' file) non lascia iscritti dei lotti
+precedenti.
+"""
+from __future__ import annotations
+
+import csv
+import io
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import search, summaries
+from .forms import MemberForm
+from .models import Member, User
+
+DEFAULT_BATCH_SIZE = 500
+
+COLUMN_ALIASES = {
+    "nome": "first_name",
+    "cognome": "last_name",
+    "email": "email",
+    "telefono": "phone",
+    "ruolo": "role",
+    "attivo": "active",
+    "nome_utente": "username",
+    "username": "username",
+}
+TRUE_VALUES = {"1", "si", "sì", "true", "vero", "x", "attivo"}
+
+
+class ImportFileError(Exception):
+    """Il file non e' leggibile o non contiene le colonne richieste."""
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    users_created: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+
+class MemberImportForm(MemberForm):
+    """Regole di ``MemberForm`` senza il controllo di unicita' riga per riga."""
+
+    def validate_unique(self) -> None:
+        pass  # verificata per l'intero lotto con una sola query
+
+
+def _normalize_header(name: Optional[str]) -> str:
+    key = (name or "").strip().lower().replace(" ", "_")
+    return COLUMN_ALIASES.get(key, key)
+
+
+def _normalize_row(row: Dict[str, object]) -> Dict[str, str]:
+    data = {key: "" if value is None else str(value).strip() for key, value in row.items()}
+    active = data.get("active", "")
+    data["active"] = "true" if not active or active.lower() in TRUE_VALUES else "false"
+    data["role"] = (data.get("role") or Member.ROLE_ASSOCIATO).lower()
+    return data
+
+
+def read_rows(file: IO[bytes], filename: str) -> Iterator[Dict[str, str]]:
+    """Restituisce le righe del file come dizionari con nomi di colonna normalizzati."""
+
+    if filename.lower().endswith(".xlsx"):
+        rows = _read_xlsx(file)
+    else:
+        rows = _read_csv(file)
+    header = [_normalize_header(name) for name in next(rows, [])]
+    missing = {"first_name", "last_name", "email"} - set(header)
+    if missing:
+        raise ImportFileError(f"Colonne mancanti: {', '.join(sorted(missing))}.")
+    for values in rows:
+        if not any(values):
+            continue
+        yield _normalize_row(dict(zip(header, values)))
+
+
+def _read_csv(file: IO[bytes]) -> Iterator[List[str]]:
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(text, dialect)
+    except UnicodeDecodeError as exc:
+        # tipico dei CSV salvati da Excel in Windows-1252
+        raise ImportFileError("Il file non e' codificato in UTF-8: salvalo come \"CSV UTF-8\" e riprova.") from exc
+
+
+def _read_xlsx(file: IO[bytes]) -> Iterator[List[object]]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError as exc:  # dipendenza opzionale
+        raise ImportFileError("Per importare file XLSX installa il pacchetto openpyxl.") from exc
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        for values in workbook.active.iter_rows(values_only=True):
+            yield list(values)
+    finally:
+        workbook.close()
+
+
+def import_members(
+    rows: Iterable[Dict[str, str]],
+    password: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> ImportResult:
+    """Valida e crea iscritti (e utenti, se e' presente ``username``) a lotti.
+
+    Tutti gli utenti importati ricevono la stessa password iniziale, calcolata
+    una sola volta; senza ``password`` l'accesso resta disabilitato finche'
+    un amministratore non ne imposta una.
+    """
+
+    result = ImportResult()
+    password_hash = make_password(password)
+    numbered = enumerate(rows, start=2)  # la riga 1 e' l'intestazione
+    with transaction.atomic():
+        while True:
+            batch = list(islice(numbered, batch_size))
+            if not batch:
+                break
+            _import_batch(batch, password_hash, result)
+    result.errors.sort()
+    return result
+
+
+def _import_batch(batch: List[Tuple[int, Dict[str, str]]], password_hash: str, result: ImportResult) -> None:
+    valid = []
+    seen_emails = set()
+    seen_usernames = set()
+    for line, row in batch:
+        form = MemberImportForm(data=row)
+        if not form.is_valid():
+            messages = "; ".join(f"{name}: {' '.join(errors)}" for name, errors in form.errors.items())
+            result.errors.append((line, messages))
+            continue
+        email = form.cleaned_data["email"]
+        username = row.get("username", "")
+        if username:
+            try:
+                User._meta.get_field("username").clean(username, None)
+            except ValidationError as exc:
+                result.errors.append((line, f"username: {' '.join(exc.messages)}"))
+                continue
+        if email.lower() in seen_emails:
+            result.errors.append((line, f"email: {email} ripetuta nel file."))
+            continue
+        if username and username in seen_usernames:
+            result.errors.append((line, f"username: {username} ripetuto nel file."))
+            continue
+        seen_emails.add(email.lower())
+        if username:
+            seen_usernames.add(username)
+        valid.append((line, form.cleaned_data, username))
+
+    existing_emails = set(
+        Member.objects.filter(email__in=[data["email"] for _, data, _ in valid]).values_list("email", flat=True)
+    )
+    existing_usernames = set(
+        User.objects.filter(username__in=[username for _, _, username in valid if username]).values_list(
+            "username", flat=True
+        )
+    )
+    members = []
+    usernames = []
+    for line, data, username in valid:
+        if data["email"] in existing_emails:
+            result.errors.append((line, f"email: {data['email']} appartiene gia' a un iscritto."))
+        elif username in existing_usernames:
+            result.errors.append((line, f"username: {username} e' gia' in uso."))
+        else:
+            member = Member(**data)
+            member.update_search_fields()  # bulk_create non chiama save()
+            members.append(member)
+            usernames.append(username)
+    if not members:
+        return
+
+    members = Member.objects.bulk_create(members)
+    users = User.objects.bulk_create(
+        User(
+            username=username,
+            password=password_hash,
+            email=member.email,
+            first_name=member.first_name,
+            last_name=member.last_name,
+            role=member.role,
+            member=member,
+        )
+        for member, username in zip(members, usernames)
+        if username
+    )
+    # bulk_create non invia segnali: aggiorna il riepilogo della dashboard e l'indice di ricerca
+    summaries.apply_delta(summaries.ACTIVE_MEMBERS_KEY, sum(1 for member in members if member.active))
+    search.index_objects(members)
+    result.created += len(members)
+    result.users_created += len(users)
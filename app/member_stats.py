@@ -0,0 +1,116 @@
+"""Statistiche denormalizzate di ogni iscritto.
+
+I contatori di :class:`~app.models.Member` (eventi a cui e' iscritto,
+eventi frequentati, quote pagate e pendenti, importo arretrato) sono
+aggiornati con incrementi atomici dai segnali di ``Participation`` e
+``MembershipFee``; le operazioni massive, che non inviano segnali, li
+riallineano con :func:`refresh`, un unico ``UPDATE`` con sottoquery. Cosi'
+l'elenco iscritti puo' ordinare e filtrare su questi valori senza
+aggregare le tabelle collegate.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.db.models import Count, DecimalField, F, OuterRef, Q, QuerySet, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Member, MembershipFee, Participation
+
+STAT_FIELDS = Member.STAT_FIELDS
+
+
+def participation_stats(waitlisted: bool, presence: bool) -> Dict[str, int]:
+    """Contributo di una partecipazione ai contatori del suo iscritto."""
+
+    if waitlisted:
+        return {"events_registered": 0, "events_attended": 0}
+    return {"events_registered": 1, "events_attended": 1 if presence else 0}
+
+
+def fee_stats(status: str, amount) -> Dict[str, object]:
+    """Contributo di una quota ai contatori del suo iscritto."""
+
+    pending = status == MembershipFee.STATUS_PENDENTE
+    return {
+        "fees_paid": 1 if status == MembershipFee.STATUS_PAGATO else 0,
+        "fees_pending": 1 if pending else 0,
+        "arrears": amount if pending else Decimal("0"),
+    }
+
+
+def apply_delta(members, **deltas) -> None:
+    """Somma ``deltas`` ai contatori di ``members`` (un ID o un queryset) con un solo UPDATE."""
+
+    changes = {name: F(name) + value for name, value in deltas.items() if value}
+    if not changes:
+        return
+    queryset = members if isinstance(members, QuerySet) else Member.objects.filter(pk=members)
+    queryset.update(**changes)
+
+
+def transfer(
+    before_member: Optional[int], before: Dict[str, object], after_member: Optional[int], after: Dict[str, object]
+) -> None:
+    """Sposta il contributo di una riga da ``before`` (di ``before_member``) a ``after`` (di ``after_member``).
+
+    Per una riga nuova ``before_member`` e' ``None``, per una riga eliminata lo e' ``after_member``.
+    """
+
+    if before_member == after_member:
+        apply_delta(after_member, **{name: after[name] - before[name] for name in after})
+        return
+    if before_member is not None:
+        apply_delta(before_member, **{name: -value for name, value in before.items()})
+    if after_member is not None:
+        apply_delta(after_member, **after)
+
+
+def _count(queryset: QuerySet) -> Coalesce:
+    rows = queryset.filter(member=OuterRef("pk")).order_by().values("member").annotate(value=Count("id"))
+    return Coalesce(Subquery(rows.values("value")), 0)
+
+
+def stat_expressions(participation_model=Participation, fee_model=MembershipFee) -> Dict[str, object]:
+    """Espressioni che ricalcolano le statistiche dalle tabelle di origine.
+
+    Accetta i modelli come parametri per poter essere usata anche dalle migrazioni.
+    """
+
+    participations = participation_model.objects.filter(waitlisted=False)
+    pending = fee_model.objects.filter(status=MembershipFee.STATUS_PENDENTE)
+    arrears = pending.filter(member=OuterRef("pk")).order_by().values("member").annotate(value=Sum("amount"))
+    money = DecimalField(max_digits=10, decimal_places=2)
+    return {
+        "events_registered": _count(participations),
+        "events_attended": _count(participations.filter(presence=True)),
+        "fees_paid": _count(fee_model.objects.filter(status=MembershipFee.STATUS_PAGATO)),
+        "fees_pending": _count(pending),
+        "arrears": Coalesce(
+            Subquery(arrears.values("value"), output_field=money), Value(Decimal("0")), output_field=money
+        ),
+    }
+
+
+def refresh(members: Optional[QuerySet] = None) -> int:
+    """Ricalcola le statistiche di ``members`` (tutti gli iscritti se ``None``) con un unico UPDATE."""
+
+    queryset = Member.objects.all() if members is None else members
+    return queryset.update(**stat_expressions())
+
+
+def check() -> List[str]:
+    """Iscritti le cui statistiche non corrispondono a quelle ricalcolate."""
+
+    live = {f"live_{name}": expression for name, expression in stat_expressions().items()}
+    mismatch = Q()
+    for name in STAT_FIELDS:
+        mismatch |= ~Q(**{name: F(f"live_{name}")})
+    rows = Member.objects.annotate(**live).filter(mismatch).order_by("pk")
+    differences = []
+    for member in rows:
+        stored = ", ".join(f"{name}={getattr(member, name)}" for name in STAT_FIELDS)
+        expected = ", ".join(f"{name}={getattr(member, f'live_{name}')}" for name in STAT_FIELDS)
+        differences.append(f"{member.code} {member.full_name}: {stored} (atteso {expected})")
+    return differences
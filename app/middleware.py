@@ -0,0 +1,173 @@
+"""Middleware opzionale per misurare il costo di ogni richiesta.
+
+Per ogni risposta registra tempo totale, numero e durata delle query SQL,
+tempo di rendering dei template e dimensione del corpo. I valori vengono
+esposti nell'header ``Server-Timing`` e conservati in un buffer circolare
+in memoria consultabile dalla pagina ``performance_report``.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Deque, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template as DjangoTemplate
+
+DEFAULT_BUFFER_SIZE = 500
+DUPLICATES_PER_REQUEST = 5
+
+_current: ContextVar[Optional["RequestRecorder"]] = ContextVar("assohub_performance_recorder", default=None)
+_lock = threading.Lock()
+_samples: Deque["RequestSample"] = deque(maxlen=getattr(settings, "ASSOHUB_PERFORMANCE_BUFFER", DEFAULT_BUFFER_SIZE))
+
+
+@dataclass
+class RequestSample:
+    route: str
+    method: str
+    status: int
+    total_ms: float
+    sql_count: int
+    sql_ms: float
+    template_ms: float
+    size: Optional[int]
+    duplicates: List[Tuple[str, int]] = field(default_factory=list)
+
+
+class RequestRecorder:
+    def __init__(self) -> None:
+        self.sql: Counter = Counter()
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_ms += (time.perf_counter() - started) * 1000
+            self.sql_count += 1
+            self.sql[sql] += 1
+
+    def duplicates(self) -> List[Tuple[str, int]]:
+        """Query eseguite piu' volte con la stessa forma: tipico segnale di N+1."""
+
+        repeated = [(sql, count) for sql, count in self.sql.items() if count > 1]
+        repeated.sort(key=lambda item: item[1], reverse=True)
+        return repeated[:DUPLICATES_PER_REQUEST]
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        recorder = _current.get()
+        if recorder is None:
+            return render(self, *args, **kwargs)
+        recorder._template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            recorder._template_depth -= 1
+            if not recorder._template_depth:  # i template annidati sono gia' inclusi nel padre
+                recorder.template_ms += (time.perf_counter() - started) * 1000
+
+    wrapper._assohub_timed = True
+    return wrapper
+
+
+def _install_template_timer() -> None:
+    if not getattr(DjangoTemplate.render, "_assohub_timed", False):
+        DjangoTemplate.render = _timed_render(DjangoTemplate.render)
+
+
+def recent_samples() -> List[RequestSample]:
+    with _lock:
+        return list(_samples)
+
+
+def clear_samples() -> None:
+    with _lock:
+        _samples.clear()
+
+
+def slowest_routes(limit: int = 10) -> List[dict]:
+    """Statistiche per rotta ordinate per tempo medio decrescente."""
+
+    routes: dict = {}
+    for sample in recent_samples():
+        stats = routes.setdefault(
+            sample.route, {"route": sample.route, "requests": 0, "total_ms": 0.0, "max_ms": 0.0, "queries": 0}
+        )
+        stats["requests"] += 1
+        stats["total_ms"] += sample.total_ms
+        stats["max_ms"] = max(stats["max_ms"], sample.total_ms)
+        stats["queries"] += sample.sql_count
+    for stats in routes.values():
+        stats["avg_ms"] = stats["total_ms"] / stats["requests"]
+        stats["avg_queries"] = stats["queries"] / stats["requests"]
+    return sorted(routes.values(), key=lambda stats: stats["avg_ms"], reverse=True)[:limit]
+
+
+def worst_duplicates(limit: int = 10) -> List[dict]:
+    """Query duplicate con il maggior numero di ripetizioni in una singola richiesta."""
+
+    worst: dict = {}
+    for sample in recent_samples():
+        for sql, count in sample.duplicates:
+            current = worst.get(sql)
+            if current is None or count > current["count"]:
+                worst[sql] = {"sql": sql, "count": count, "route": sample.route}
+    return sorted(worst.values(), key=lambda item: item["count"], reverse=True)[:limit]
+
+
+class PerformanceMiddleware:
+    """Misura ogni richiesta e aggiunge l'header ``Server-Timing``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _install_template_timer()
+
+    def __call__(self, request):
+        recorder = RequestRecorder()
+        token = _current.set(recorder)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        match = request.resolver_match
+        sample = RequestSample(
+            route=(match.view_name if match else request.path),
+            method=request.method,
+            status=response.status_code,
+            total_ms=total_ms,
+            sql_count=recorder.sql_count,
+            sql_ms=recorder.sql_ms,
+            template_ms=recorder.template_ms,
+            size=None if response.streaming else len(response.content),
+            duplicates=recorder.duplicates(),
+        )
+        with _lock:
+            _samples.append(sample)
+
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={sample.sql_ms:.1f};desc="{sample.sql_count} query"',
+                f"tpl;dur={sample.template_ms:.1f}",
+                f"total;dur={sample.total_ms:.1f}",
+            ]
+        )
+        return response
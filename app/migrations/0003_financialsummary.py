@@ -0,0 +1,58 @@
+# Generated by Django 4.2.11 on 2026-10-17 20:12
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_summary(apps, schema_editor):
+    FinancialSummary = apps.get_model("app", "FinancialSummary")
+    Member = apps.get_model("app", "Member")
+    Event = apps.get_model("app", "Event")
+    FinancialTransaction = apps.get_model("app", "FinancialTransaction")
+    MembershipFee = apps.get_model("app", "MembershipFee")
+
+    rows = {
+        "iscritti:attivi": (Member.objects.filter(active=True).count(), 0),
+        "eventi:totale": (Event.objects.count(), 0),
+        "movimenti:entrata": (0, 0),
+        "movimenti:uscita": (0, 0),
+        "quote:pendente": (0, 0),
+        "quote:pagato": (0, 0),
+    }
+    transactions = (
+        FinancialTransaction.objects.order_by()
+        .values("transaction_type")
+        .annotate(count=Count("id"), total=Sum("amount"))
+    )
+    for row in transactions:
+        rows[f"movimenti:{row['transaction_type']}"] = (row["count"], row["total"] or 0)
+    for row in MembershipFee.objects.order_by().values("status").annotate(count=Count("id"), total=Sum("amount")):
+        rows[f"quote:{row['status']}"] = (row["count"], row["total"] or 0)
+    FinancialSummary.objects.bulk_create(
+        FinancialSummary(key=key, count=count, total=total) for key, (count, total) in rows.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_alter_user_member'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinancialSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, unique=True)),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Riepilogo finanziario',
+                'verbose_name_plural': 'Riepiloghi finanziari',
+                'ordering': ['key'],
+            },
+        ),
+        migrations.RunPython(populate_summary, migrations.RunPython.noop),
+    ]
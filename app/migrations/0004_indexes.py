@@ -0,0 +1,45 @@
+# Generated by Django 4.2.11 on 2026-10-17 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_financialsummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['date'], name='event_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='financialtransaction',
+            index=models.Index(fields=['-date', '-id'], name='transaction_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='financialtransaction',
+            index=models.Index(fields=['transaction_type', 'date'], name='transaction_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['last_name', 'first_name'], name='member_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(condition=models.Q(('active', True)), fields=['last_name', 'first_name'], name='member_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membershipfee',
+            index=models.Index(fields=['status'], name='fee_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membershipfee',
+            index=models.Index(fields=['-year'], name='fee_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membershipfee',
+            index=models.Index(condition=models.Q(('status', 'pendente')), fields=['year'], name='fee_pending_idx'),
+        ),
+    ]
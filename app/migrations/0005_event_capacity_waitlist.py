@@ -0,0 +1,27 @@
+# Generated by Django 4.2.11 on 2026-10-17 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Lascia vuoto per non limitare le iscrizioni.', null=True, verbose_name='Posti disponibili'),
+        ),
+        migrations.AddField(
+            model_name='participation',
+            name='waitlisted',
+            field=models.BooleanField(default=False, verbose_name="In lista d'attesa"),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(condition=models.Q(('waitlisted', True)), fields=['event', 'registered_at'], name='participation_waitlist_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.11 on 2026-10-17 20:44
+
+from django.db import migrations, models
+
+from app.member_stats import stat_expressions
+
+
+def populate_member_stats(apps, schema_editor):
+    Member = apps.get_model("app", "Member")
+    Participation = apps.get_model("app", "Participation")
+    MembershipFee = apps.get_model("app", "MembershipFee")
+    Member.objects.update(**stat_expressions(Participation, MembershipFee))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_event_capacity_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='arrears',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10, verbose_name='Arretrati'),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='events_attended',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Eventi frequentati'),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='events_registered',
+            field=models.IntegerField(default=0, editable=False, verbose_name="Eventi a cui e' iscritto"),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='fees_paid',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Quote pagate'),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='fees_pending',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Quote pendenti'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(condition=models.Q(('arrears__gt', 0)), fields=['-arrears'], name='member_arrears_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['-events_attended'], name='member_attended_idx'),
+        ),
+        migrations.RunPython(populate_member_stats, migrations.RunPython.noop),
+    ]
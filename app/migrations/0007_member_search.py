@@ -0,0 +1,61 @@
+# Generated by Django 4.2.11 on 2026-10-17 20:49
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalize_search(value):
+    # copia di app.models.normalize_search al momento della migrazione
+    text = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+    return " ".join(text.lower().split())
+
+
+def populate_search_fields(apps, schema_editor):
+    Member = apps.get_model("app", "Member")
+    batch = []
+    for member in Member.objects.only("first_name", "last_name", "email").iterator(chunk_size=2000):
+        member.search_name = normalize_search(f"{member.last_name} {member.first_name}")
+        member.search_email = normalize_search(member.email)
+        batch.append(member)
+        if len(batch) == 2000:
+            Member.objects.bulk_update(batch, ["search_name", "search_email"])
+            batch = []
+    Member.objects.bulk_update(batch, ["search_name", "search_email"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_member_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='search_email',
+            field=models.CharField(default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='search_name',
+            field=models.CharField(default='', editable=False, max_length=301),
+        ),
+        migrations.RunPython(populate_search_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(condition=models.Q(('active', False)), fields=['last_name', 'first_name'], name='member_inactive_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['role', 'last_name', 'first_name'], name='member_role_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['search_name'], name='member_search_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['search_email'], name='member_search_email_idx'),
+        ),
+    ]
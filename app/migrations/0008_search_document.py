@@ -0,0 +1,168 @@
+# Generated by Django 4.2.11 on 2026-10-17 20:54
+
+import unicodedata
+
+from django.db import OperationalError, migrations, models, transaction
+from django.utils import timezone
+
+# indice full-text e documenti come erano al momento della migrazione: non usa il codice di app.search
+SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE app_search_fts USING fts5(
+        title_terms, body_terms,
+        content='app_searchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER app_search_fts_insert AFTER INSERT ON app_searchdocument BEGIN
+        INSERT INTO app_search_fts(rowid, title_terms, body_terms) VALUES (new.id, new.title_terms, new.body_terms);
+    END
+    """,
+    """
+    CREATE TRIGGER app_search_fts_delete AFTER DELETE ON app_searchdocument BEGIN
+        INSERT INTO app_search_fts(app_search_fts, rowid, title_terms, body_terms)
+        VALUES ('delete', old.id, old.title_terms, old.body_terms);
+    END
+    """,
+    """
+    CREATE TRIGGER app_search_fts_update AFTER UPDATE ON app_searchdocument BEGIN
+        INSERT INTO app_search_fts(app_search_fts, rowid, title_terms, body_terms)
+        VALUES ('delete', old.id, old.title_terms, old.body_terms);
+        INSERT INTO app_search_fts(rowid, title_terms, body_terms) VALUES (new.id, new.title_terms, new.body_terms);
+    END
+    """,
+    "INSERT INTO app_search_fts(app_search_fts) VALUES ('rebuild')",
+]
+SQLITE_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS app_search_fts_insert",
+    "DROP TRIGGER IF EXISTS app_search_fts_delete",
+    "DROP TRIGGER IF EXISTS app_search_fts_update",
+    "DROP TABLE IF EXISTS app_search_fts",
+]
+POSTGRES_SETUP = [
+    """
+    ALTER TABLE app_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', title_terms), 'A') || setweight(to_tsvector('simple', body_terms), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX app_search_vector_idx ON app_searchdocument USING GIN (search_vector)",
+]
+POSTGRES_TEARDOWN = [
+    "DROP INDEX IF EXISTS app_search_vector_idx",
+    "ALTER TABLE app_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+TRANSACTION_LABELS = {"entrata": "Entrata", "uscita": "Uscita"}
+
+
+def normalize_search(value):
+    text = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+    return " ".join(text.lower().split())
+
+
+def fit(value, max_length=255):
+    return value if len(value) <= max_length else value[: max_length - 1] + "…"
+
+
+def member_document(member):
+    name = f"{member.first_name} {member.last_name}".strip()
+    return dict(
+        kind="iscritto",
+        title=name,
+        detail=member.email,
+        title_terms=normalize_search(name),
+        body_terms=normalize_search(f"{member.email} {member.phone}"),
+    )
+
+
+def event_document(event):
+    when = timezone.localtime(event.date) if timezone.is_aware(event.date) else event.date
+    return dict(
+        kind="evento",
+        title=event.title,
+        detail=f"{when:%d/%m/%Y} - {event.location}",
+        title_terms=normalize_search(event.title),
+        body_terms=normalize_search(f"{event.location} {event.description}"),
+    )
+
+
+def transaction_document(entry):
+    label = TRANSACTION_LABELS.get(entry.transaction_type, entry.transaction_type)
+    return dict(
+        kind="movimento",
+        title=entry.description,
+        detail=f"{label} € {entry.amount} - {entry.date:%d/%m/%Y}",
+        title_terms=normalize_search(entry.description),
+        body_terms=normalize_search(label),
+    )
+
+
+def install_fulltext(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for statement in POSTGRES_SETUP:
+            schema_editor.execute(statement)
+    elif vendor == "sqlite":
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                for statement in SQLITE_SETUP:
+                    schema_editor.execute(statement)
+        except OperationalError:
+            pass  # SQLite senza FTS5: la ricerca usera' LIKE
+
+
+def uninstall_fulltext(apps, schema_editor):
+    statements = {"postgresql": POSTGRES_TEARDOWN, "sqlite": SQLITE_TEARDOWN}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def populate_documents(apps, schema_editor):
+    SearchDocument = apps.get_model("app", "SearchDocument")
+    for name, build in (
+        ("Member", member_document),
+        ("Event", event_document),
+        ("FinancialTransaction", transaction_document),
+    ):
+        objects = apps.get_model("app", name).objects.order_by("pk").iterator(chunk_size=2000)
+        documents = []
+        for instance in objects:
+            values = build(instance)
+            values["title"], values["detail"] = fit(values["title"]), fit(values["detail"])
+            documents.append(SearchDocument(object_id=instance.pk, **values))
+            if len(documents) == 500:
+                SearchDocument.objects.bulk_create(documents)
+                documents = []
+        SearchDocument.objects.bulk_create(documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_member_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('iscritto', 'Iscritto'), ('evento', 'Evento'), ('movimento', 'Movimento')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('detail', models.CharField(blank=True, max_length=255)),
+                ('title_terms', models.TextField()),
+                ('body_terms', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Documento di ricerca',
+                'verbose_name_plural': 'Documenti di ricerca',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document'),
+        ),
+        migrations.RunPython(install_fulltext, uninstall_fulltext),
+        migrations.RunPython(populate_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.11 on 2026-10-17 21:14
+
+from django.db import migrations, models
+
+from app.event_stats import stat_expressions
+
+
+def populate_event_stats(apps, schema_editor):
+    Event = apps.get_model("app", "Event")
+    Participation = apps.get_model("app", "Participation")
+    Event.objects.update(**stat_expressions(Participation))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='participants_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Iscritti'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='present_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Presenti'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='waitlist_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name="In lista d'attesa"),
+        ),
+        migrations.RunPython(populate_event_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.11 on 2026-10-17 21:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_event_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FiscalYearClosing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField(unique=True, verbose_name='Esercizio')),
+                ('opening_balance', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Saldo di apertura')),
+                ('income', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Entrate')),
+                ('expense', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Uscite')),
+                ('income_count', models.IntegerField(verbose_name='Movimenti in entrata')),
+                ('expense_count', models.IntegerField(verbose_name='Movimenti in uscita')),
+                ('total_income', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Entrate progressive')),
+                ('total_expense', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Uscite progressive')),
+                ('total_income_count', models.IntegerField(verbose_name='Entrate progressive (movimenti)')),
+                ('total_expense_count', models.IntegerField(verbose_name='Uscite progressive (movimenti)')),
+                ('closed_at', models.DateTimeField(auto_now_add=True, verbose_name='Chiuso il')),
+            ],
+            options={
+                'verbose_name': "Chiusura d'esercizio",
+                'verbose_name_plural': "Chiusure d'esercizio",
+                'ordering': ['-year'],
+            },
+        ),
+    ]
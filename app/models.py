@@ -1,14 +1,46 @@
 from __future__ import annotations
 
+import unicodedata
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date
+from typing import Iterator, Optional
+
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, router, transaction
 from django.utils import timezone
+from django.utils.functional import cached_property
+
+
+# dentro User.bulk_creation(): False finche' non e' stato salvato un utente, poi True
+_users_exist: ContextVar[Optional[bool]] = ContextVar("assohub_users_exist", default=None)
 
 
 def current_year() -> int:
     return timezone.now().year
 
 
+def update_fields_without(instance: models.Model, excluded, kwargs: dict) -> None:
+    """Su un salvataggio completo di un'istanza esistente scrive tutte le colonne tranne ``excluded``.
+
+    Serve ai contatori mantenuti con incrementi ``F()``: riscrivere i valori letti
+    al caricamento dell'istanza annullerebbe gli incrementi avvenuti nel frattempo.
+    """
+
+    if instance._state.adding or kwargs.get("force_insert") or kwargs.get("update_fields") is not None:
+        return
+    kwargs["update_fields"] = [
+        field.name for field in instance._meta.concrete_fields if not field.primary_key and field.name not in excluded
+    ]
+
+
+def normalize_search(value: str) -> str:
+    """Testo minuscolo, senza accenti e spazi ripetuti, come nelle colonne di ricerca."""
+
+    text = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+    return " ".join(text.lower().split())
+
+
 class Member(models.Model):
     ROLE_ASSOCIATO = "associato"
     ROLE_AMMINISTRATORE = "amministratore"
@@ -16,6 +48,7 @@ class Member(models.Model):
         (ROLE_ASSOCIATO, "Associato"),
         (ROLE_AMMINISTRATORE, "Amministratore"),
     ]
+    STAT_FIELDS = ("events_registered", "events_attended", "fees_paid", "fees_pending", "arrears")
 
     first_name = models.CharField(max_length=150)
     last_name = models.CharField(max_length=150)
@@ -23,48 +56,128 @@ class Member(models.Model):
     phone = models.CharField(max_length=30, blank=True)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default=ROLE_ASSOCIATO)
     active = models.BooleanField(default=True)
+    # colonne normalizzate per la ricerca per prefisso, indipendente da maiuscole e accenti
+    search_name = models.CharField(max_length=301, default="", editable=False)
+    search_email = models.CharField(max_length=254, default="", editable=False)
+    # statistiche denormalizzate, mantenute in modo incrementale da app.member_stats
+    events_registered = models.IntegerField("Eventi a cui e' iscritto", default=0, editable=False)
+    events_attended = models.IntegerField("Eventi frequentati", default=0, editable=False)
+    fees_paid = models.IntegerField("Quote pagate", default=0, editable=False)
+    fees_pending = models.IntegerField("Quote pendenti", default=0, editable=False)
+    arrears = models.DecimalField("Arretrati", max_digits=10, decimal_places=2, default=0, editable=False)
 
     class Meta:
         ordering = ["last_name", "first_name"]
+        indexes = [
+            models.Index(fields=["last_name", "first_name"], name="member_name_idx"),
+            models.Index(
+                fields=["last_name", "first_name"],
+                name="member_active_name_idx",
+                condition=models.Q(active=True),
+            ),
+            models.Index(
+                fields=["last_name", "first_name"],
+                name="member_inactive_name_idx",
+                condition=models.Q(active=False),
+            ),
+            models.Index(fields=["role", "last_name", "first_name"], name="member_role_name_idx"),
+            models.Index(fields=["search_name"], name="member_search_name_idx"),
+            models.Index(fields=["search_email"], name="member_search_email_idx"),
+            models.Index(fields=["-arrears"], name="member_arrears_idx", condition=models.Q(arrears__gt=0)),
+            models.Index(fields=["-events_attended"], name="member_attended_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.full_name}"
 
+    def save(self, *args, **kwargs):
+        self.update_search_fields()
+        update_fields_without(self, self.STAT_FIELDS, kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"first_name", "last_name", "email"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "search_name", "search_email"}
+        super().save(*args, **kwargs)
+
+    def update_search_fields(self) -> None:
+        """Ricalcola le colonne di ricerca; va chiamato esplicitamente prima di ``bulk_create``."""
+
+        self.search_name = normalize_search(f"{self.last_name} {self.first_name}")
+        self.search_email = normalize_search(self.email)
+
     @property
     def full_name(self) -> str:
         return f"{self.first_name} {self.last_name}".strip()
 
+    @property
+    def code(self) -> str:
+        """Codice della tessera, letto dallo scanner al check-in (es. ``M000123``)."""
+
+        return f"M{self.pk:06d}"
+
+    @property
+    def attendance_rate(self) -> int | None:
+        """Percentuale di eventi frequentati tra quelli a cui e' iscritto."""
+
+        if not self.events_registered:
+            return None
+        return round(self.events_attended * 100 / self.events_registered)
+
 
 class User(AbstractUser):
     ROLE_ASSOCIATO = Member.ROLE_ASSOCIATO
     ROLE_AMMINISTRATORE = Member.ROLE_AMMINISTRATORE
     ROLE_CHOICES = Member.ROLE_CHOICES
+    # proprieta' calcolate una volta per istanza, cioe' una volta per richiesta
+    MEMOIZED = ("is_associate", "is_administrator", "display_name", "has_member")
 
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default=ROLE_ASSOCIATO)
     member = models.OneToOneField(Member, on_delete=models.CASCADE, related_name="user", blank=True, null=True)
 
     def save(self, *args, **kwargs):
-        if self._state.adding and not type(self).objects.exists():  # first user defaults to admin
+        # il ruolo viene allineato a quello dell'iscritto da signals.user_saved; ogni nuovo utente
+        # costa un exists() in piu' (SELECT ... LIMIT 1), tranne dopo il primo dentro bulk_creation()
+        adding = self._state.adding
+        if adding and not _users_exist.get() and not type(self).objects.exists():  # first user defaults to admin
             self.role = self.ROLE_AMMINISTRATORE
-        if self.member_id:
-            try:
-                member = self.member
-            except Member.DoesNotExist:  # user can exist without linked member
-                member = None
-            if member and member.role != self.role:
-                member.role = self.role
-                member.save(update_fields=["role"])
         super().save(*args, **kwargs)
+        if adding and _users_exist.get() is False:
+            _users_exist.set(True)
+        self.forget_memoized()
+
+    @classmethod
+    @contextmanager
+    def bulk_creation(cls) -> Iterator[None]:
+        """Creazione di piu' utenti di fila: si controlla una sola volta se esiste gia' un utente.
+
+        Vale solo per il blocco ``with`` corrente; fuori ogni nuovo utente
+        ricontrolla la tabella, perche' altri processi possono averla svuotata.
+        Le importazioni usano ``bulk_create``, che non passa da :meth:`save`
+        e non esegue il controllo.
+        """
+
+        token = _users_exist.set(False)
+        try:
+            yield
+        finally:
+            _users_exist.reset(token)
 
-    @property
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.forget_memoized()
+
+    def forget_memoized(self) -> None:
+        for name in self.MEMOIZED:
+            self.__dict__.pop(name, None)
+
+    @cached_property
     def is_associate(self) -> bool:
         return self.role == self.ROLE_ASSOCIATO
 
-    @property
+    @cached_property
     def is_administrator(self) -> bool:
         return self.role == self.ROLE_AMMINISTRATORE
 
-    @property
+    @cached_property
     def display_name(self) -> str:
         try:
             member = self.member
@@ -75,8 +188,7 @@ class User(AbstractUser):
         full_name = self.get_full_name()
         return full_name or self.username
 
-
-    @property
+    @cached_property
     def has_member(self) -> bool:
         if not self.member_id:
             return False
@@ -108,32 +220,70 @@ class MembershipFee(models.Model):
             models.UniqueConstraint(fields=["member", "year"], name="unique_fee_per_member_year"),
         ]
         ordering = ["-year", "member__last_name"]
+        indexes = [
+            models.Index(fields=["status"], name="fee_status_idx"),
+            models.Index(fields=["-year"], name="fee_year_idx"),
+            models.Index(
+                fields=["year"],
+                name="fee_pending_idx",
+                condition=models.Q(status="pendente"),
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"Quota {self.year} - {self.member.full_name}"
 
 
 class Event(models.Model):
+    STAT_FIELDS = ("participants_count", "waitlist_count", "present_count")
+
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     date = models.DateTimeField()
     location = models.CharField(max_length=200)
+    capacity = models.PositiveIntegerField(
+        "Posti disponibili", blank=True, null=True, help_text="Lascia vuoto per non limitare le iscrizioni."
+    )
+    # contatori denormalizzati, mantenuti da app.event_stats
+    participants_count = models.IntegerField("Iscritti", default=0, editable=False)
+    waitlist_count = models.IntegerField("In lista d'attesa", default=0, editable=False)
+    present_count = models.IntegerField("Presenti", default=0, editable=False)
 
     class Meta:
         ordering = ["date"]
+        indexes = [
+            models.Index(fields=["date"], name="event_date_idx"),
+        ]
 
     def __str__(self) -> str:
         return self.title
 
+    def save(self, *args, **kwargs):
+        update_fields_without(self, self.STAT_FIELDS, kwargs)
+        super().save(*args, **kwargs)
+
     @property
     def is_future(self) -> bool:
         return self.date >= timezone.now()
 
+    @property
+    def is_full(self) -> bool:
+        return self.capacity is not None and self.participants_count >= self.capacity
+
+    @property
+    def turnout(self) -> int | None:
+        """Percentuale di presenti tra gli iscritti confermati."""
+
+        if not self.participants_count:
+            return None
+        return round(self.present_count * 100 / self.participants_count)
+
 
 class Participation(models.Model):
     member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name="participations")
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="participations")
     presence = models.BooleanField(default=False)
+    waitlisted = models.BooleanField("In lista d'attesa", default=False)
     registered_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -141,6 +291,13 @@ class Participation(models.Model):
             models.UniqueConstraint(fields=["member", "event"], name="unique_participation"),
         ]
         ordering = ["event__date"]
+        indexes = [
+            models.Index(
+                fields=["event", "registered_at"],
+                name="participation_waitlist_idx",
+                condition=models.Q(waitlisted=True),
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.member.full_name} - {self.event.title}"
@@ -162,10 +319,107 @@ class FinancialTransaction(models.Model):
 
     class Meta:
         ordering = ["-date", "-id"]
+        indexes = [
+            models.Index(fields=["-date", "-id"], name="transaction_date_idx"),
+            models.Index(fields=["transaction_type", "date"], name="transaction_type_date_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.get_transaction_type_display()} - {self.amount} €"
 
+    def save(self, *args, **kwargs):
+        # il controllo sugli esercizi chiusi (signals.protect_closed_years) e la scrittura in un'unica transazione
+        with transaction.atomic(using=kwargs.get("using") or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+
     @property
     def signed_amount(self) -> float:
         return float(self.amount if self.transaction_type == self.TYPE_ENTRATA else -self.amount)
+
+
+class FinancialSummary(models.Model):
+    """Contatori aggregati mantenuti in modo incrementale per la dashboard."""
+
+    key = models.CharField(max_length=50, unique=True)
+    count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Riepilogo finanziario"
+        verbose_name_plural = "Riepiloghi finanziari"
+        ordering = ["key"]
+
+    def __str__(self) -> str:
+        return f"{self.key}: {self.count} / {self.total} €"
+
+
+class FiscalYearClosing(models.Model):
+    """Fotografia immutabile di un esercizio chiuso: saldo di apertura, totali dell'anno e progressivi."""
+
+    year = models.PositiveIntegerField("Esercizio", unique=True)
+    opening_balance = models.DecimalField("Saldo di apertura", max_digits=14, decimal_places=2)
+    income = models.DecimalField("Entrate", max_digits=14, decimal_places=2)
+    expense = models.DecimalField("Uscite", max_digits=14, decimal_places=2)
+    income_count = models.IntegerField("Movimenti in entrata")
+    expense_count = models.IntegerField("Movimenti in uscita")
+    # progressivi dall'inizio del registro: bastano da soli per i totali fino a fine esercizio
+    total_income = models.DecimalField("Entrate progressive", max_digits=14, decimal_places=2)
+    total_expense = models.DecimalField("Uscite progressive", max_digits=14, decimal_places=2)
+    total_income_count = models.IntegerField("Entrate progressive (movimenti)")
+    total_expense_count = models.IntegerField("Uscite progressive (movimenti)")
+    closed_at = models.DateTimeField("Chiuso il", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Chiusura d'esercizio"
+        verbose_name_plural = "Chiusure d'esercizio"
+        ordering = ["-year"]
+
+    def __str__(self) -> str:
+        return f"Esercizio {self.year}: saldo finale {self.closing_balance} €"
+
+    @property
+    def closing_balance(self):
+        return self.opening_balance + self.income - self.expense
+
+    @property
+    def end(self) -> date:
+        """Ultimo giorno dell'esercizio: i movimenti fino a questa data sono bloccati."""
+
+        return date(self.year, 12, 31)
+
+
+class SearchDocument(models.Model):
+    """Testo indicizzato per la ricerca globale, uno per iscritto, evento o movimento.
+
+    Su SQLite la tabella e' affiancata dalla tabella virtuale FTS5
+    ``app_search_fts``, su PostgreSQL da una colonna ``tsvector`` generata con
+    indice GIN: entrambe sono create dalla migrazione e aggiornate dal
+    database stesso a ogni modifica delle righe (vedi :mod:`app.search`).
+    """
+
+    KIND_MEMBER = "iscritto"
+    KIND_EVENT = "evento"
+    KIND_TRANSACTION = "movimento"
+    KIND_CHOICES = [
+        (KIND_MEMBER, "Iscritto"),
+        (KIND_EVENT, "Evento"),
+        (KIND_TRANSACTION, "Movimento"),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+    detail = models.CharField(max_length=255, blank=True)
+    # testo normalizzato (minuscolo, senza accenti) su cui lavora l'indice full-text
+    title_terms = models.TextField()
+    body_terms = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Documento di ricerca"
+        verbose_name_plural = "Documenti di ricerca"
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="unique_search_document"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.get_kind_display()}: {self.title}"
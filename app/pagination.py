@@ -0,0 +1,83 @@
+"""Paginazione a cursore (keyset) per le liste ordinate su colonne indicizzate.
+
+Invece di ``OFFSET``, ogni pagina riparte dai valori dell'ultima riga della
+pagina precedente: il costo resta costante anche nelle pagine piu' profonde.
+Il cursore e' firmato, quindi puo' trasportare anche uno stato aggiuntivo
+(ad esempio il saldo progressivo) senza poter essere manomesso.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from django.core import signing
+from django.db.models import Q, QuerySet
+
+CURSOR_SALT = "app.pagination"
+
+
+def _serialize(value: Any) -> Any:
+    if isinstance(value, (bool, int, str)) or value is None:
+        return value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _after(ordering: Sequence[str], values: Sequence[Any]) -> Q:
+    """Condizione "riga successiva a ``values``" secondo ``ordering``."""
+
+    condition = Q()
+    equal = Q()
+    for name, value in zip(ordering, values):
+        field_name = name.lstrip("-")
+        lookup = "lt" if name.startswith("-") else "gt"
+        condition |= equal & Q(**{f"{field_name}__{lookup}": value})
+        equal &= Q(**{field_name: value})
+    # limite ridondante sulla prima colonna: permette una scansione per intervallo sull'indice
+    first = ordering[0]
+    first_lookup = "lte" if first.startswith("-") else "gte"
+    return Q(**{f"{first.lstrip('-')}__{first_lookup}": values[0]}) & condition
+
+
+@dataclass
+class KeysetPage:
+    items: List[Any]
+    ordering: Sequence[str]
+    has_next: bool
+    state: Dict[str, Any] = field(default_factory=dict)
+    is_first: bool = True
+
+    def next_cursor(self, **state: Any) -> Optional[str]:
+        """Cursore per la pagina successiva, con lo stato da riportare."""
+
+        if not self.has_next or not self.items:
+            return None
+        last = self.items[-1]
+        values = [_serialize(getattr(last, name.lstrip("-"))) for name in self.ordering]
+        return signing.dumps({"v": values, "s": state}, salt=CURSOR_SALT, compress=True)
+
+
+def paginate(queryset: QuerySet, ordering: Sequence[str], cursor: Optional[str], per_page: int) -> KeysetPage:
+    """Restituisce la pagina che segue ``cursor`` (la prima se assente o non valido)."""
+
+    state: Dict[str, Any] = {}
+    queryset = queryset.order_by(*ordering)
+    is_first = True
+    if cursor:
+        try:
+            payload = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            payload = None
+        if payload and len(payload.get("v", [])) == len(ordering):
+            queryset = queryset.filter(_after(ordering, payload["v"]))
+            state = payload.get("s", {})
+            is_first = False
+    items = list(queryset[: per_page + 1])
+    return KeysetPage(
+        items=items[:per_page],
+        ordering=ordering,
+        has_next=len(items) > per_page,
+        state=state,
+        is_first=is_first,
+    )
@@ -0,0 +1,296 @@
+"""Riconciliazione dei pagamenti delle quote da estratti conto bancari.
+
+L'estratto (CSV oppure XML in formato CAMT.053) viene letto in streaming e
+ogni accredito e' confrontato con un indice in memoria delle quote
+pendenti, costruito con una sola query: prima per email, poi per nome e
+cognome, sempre a parita' di importo e anno. Le quote abbinate diventano
+pagate con un ``bulk_update`` e i relativi movimenti di entrata sono creati
+con ``bulk_create`` nella stessa transazione. Gli accrediti datati in un
+esercizio chiuso restano tra quelli non abbinati.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.etree.ElementTree import ParseError, iterparse
+
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from . import fiscal, member_stats, reports, search, summaries
+from .models import FinancialTransaction, Member, MembershipFee
+
+BATCH_SIZE = 500
+
+COLUMN_ALIASES = {
+    "data": "date",
+    "data_valuta": "date",
+    "data_operazione": "date",
+    "importo": "amount",
+    "nome": "name",
+    "ordinante": "name",
+    "email": "email",
+    "causale": "description",
+    "descrizione": "description",
+}
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+
+
+class StatementError(Exception):
+    """L'estratto conto non e' leggibile o non contiene le colonne richieste."""
+
+
+@dataclass
+class StatementLine:
+    line: int
+    date: date
+    amount: Decimal
+    name: str = ""
+    email: str = ""
+    description: str = ""
+
+    def years(self) -> List[int]:
+        """Anni citati nella causale o, in mancanza, l'anno dell'accredito."""
+
+        years = [int(value) for value in YEAR_RE.findall(self.description)]
+        return years or [self.date.year]
+
+
+@dataclass
+class ReconciliationResult:
+    matched: List[Tuple[int, str]] = field(default_factory=list)
+    unmatched: List[Tuple[int, str]] = field(default_factory=list)
+    total: Decimal = Decimal("0")
+    dry_run: bool = False
+
+
+def normalize_name(value: str) -> str:
+    """Nome senza accenti, maiuscole e ordine delle parole: "ROSSI Mario" == "mario rossi"."""
+
+    text = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+    return " ".join(sorted(re.findall(r"[a-z]+", text.lower())))
+
+
+def parse_amount(value: str) -> Decimal:
+    """Importo scritto come ``1.234,56``, ``1234.56`` o ``30``."""
+
+    text = value.strip().replace("€", "").replace(" ", "")
+    if "," in text:
+        text = text.replace(".", "").replace(",", ".")
+    try:
+        return Decimal(text)
+    except InvalidOperation as exc:
+        raise ValueError(f"importo non valido: {value}") from exc
+
+
+def _parse_date(value: str) -> date:
+    value = value.strip()
+    parsed = None
+    try:
+        parsed = parse_date(value[:10])
+    except ValueError:
+        pass
+    if parsed is None and re.fullmatch(r"\d{1,2}/\d{1,2}/\d{4}", value):
+        day, month, year = (int(part) for part in value.split("/"))
+        parsed = date(year, month, day)
+    if parsed is None:
+        raise ValueError(f"data non valida: {value}")
+    return parsed
+
+
+def read_statement(file: IO[bytes], filename: str, errors: List[Tuple[int, str]]) -> Iterator[StatementLine]:
+    """Restituisce gli accrediti dell'estratto; le righe illeggibili finiscono in ``errors``."""
+
+    if filename.lower().endswith(".xml"):
+        return _read_camt(file, errors)
+    return _read_csv(file, errors)
+
+
+def _read_csv(file: IO[bytes], errors: List[Tuple[int, str]]) -> Iterator[StatementLine]:
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        rows = csv.reader(text, dialect)
+        header = [COLUMN_ALIASES.get(name.strip().lower().replace(" ", "_"), name) for name in next(rows, [])]
+        missing = {"date", "amount"} - set(header)
+        if missing or not {"name", "email"} & set(header):
+            raise StatementError("L'estratto deve avere le colonne data, importo e nome oppure email.")
+        for line, values in enumerate(rows, start=2):
+            if not any(values):
+                continue
+            row = dict(zip(header, (value.strip() for value in values)))
+            try:
+                entry = StatementLine(
+                    line=line,
+                    date=_parse_date(row["date"]),
+                    amount=parse_amount(row["amount"]),
+                    name=row.get("name", ""),
+                    email=row.get("email", ""),
+                    description=row.get("description", ""),
+                )
+            except (KeyError, ValueError) as exc:
+                errors.append((line, str(exc)))
+                continue
+            if entry.amount > 0:
+                yield entry
+    except UnicodeDecodeError as exc:
+        # tipico delle esportazioni in Windows-1252 o Latin-1
+        raise StatementError("L'estratto non e' codificato in UTF-8: esportalo in UTF-8 e riprova.") from exc
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _read_camt(file: IO[bytes], errors: List[Tuple[int, str]]) -> Iterator[StatementLine]:
+    line = 0
+    try:
+        for _, element in iterparse(file):
+            if _local(element.tag) != "Ntry":
+                continue
+            line += 1
+            values: Dict[str, str] = {}
+            for child in element.iter():
+                name = _local(child.tag)
+                text = (child.text or "").strip()
+                if name in {"Amt", "CdtDbtInd", "Nm", "Ustrd"} and text and name not in values:
+                    values[name] = text
+                elif name in {"BookgDt", "ValDt"} and "date" not in values:
+                    values["date"] = "".join(part.text or "" for part in child).strip()
+            element.clear()  # libera la memoria dei movimenti gia' letti
+            if values.get("CdtDbtInd") != "CRDT":
+                continue
+            description = values.get("Ustrd", "")
+            email = EMAIL_RE.search(description)
+            try:
+                yield StatementLine(
+                    line=line,
+                    date=_parse_date(values.get("date", "")),
+                    amount=parse_amount(values.get("Amt", "")),
+                    name=values.get("Nm", ""),
+                    email=email.group(0) if email else "",
+                    description=description,
+                )
+            except ValueError as exc:
+                errors.append((line, str(exc)))
+    except ParseError as exc:
+        raise StatementError(f"XML non valido: {exc}") from exc
+
+
+class PendingFeeIndex:
+    """Quote pendenti indicizzate per (email, importo, anno) e (nome, importo, anno)."""
+
+    def __init__(self, lock: bool = False) -> None:
+        self.by_email: Dict[tuple, List[int]] = defaultdict(list)
+        self.by_name: Dict[tuple, List[int]] = defaultdict(list)
+        self.labels: Dict[int, str] = {}
+        self.used: set = set()
+        queryset = MembershipFee.objects.filter(status=MembershipFee.STATUS_PENDENTE).order_by("year", "id")
+        if lock:
+            queryset = queryset.select_for_update(of=("self",))
+        rows = queryset.values_list("id", "year", "amount", "member__email", "member__first_name", "member__last_name")
+        for fee_id, year, amount, email, first_name, last_name in rows:
+            self.by_email[(email.lower(), amount, year)].append(fee_id)
+            self.by_name[(normalize_name(f"{first_name} {last_name}"), amount, year)].append(fee_id)
+            self.labels[fee_id] = f"Quota {year} - {first_name} {last_name}"
+
+    def _take(self, candidates: Optional[List[int]]) -> Optional[int]:
+        for fee_id in candidates or []:
+            if fee_id not in self.used:
+                self.used.add(fee_id)
+                return fee_id
+        return None
+
+    def match(self, entry: StatementLine) -> Optional[int]:
+        name = normalize_name(entry.name)
+        for year in entry.years():
+            fee_id = None
+            if entry.email:
+                fee_id = self._take(self.by_email.get((entry.email.lower(), entry.amount, year)))
+            if fee_id is None and name:
+                fee_id = self._take(self.by_name.get((name, entry.amount, year)))
+            if fee_id is not None:
+                return fee_id
+        return None
+
+
+def reconcile(
+    lines: Iterable[StatementLine], dry_run: bool = False, batch_size: int = BATCH_SIZE
+) -> ReconciliationResult:
+    """Abbina gli accrediti alle quote pendenti e registra i pagamenti trovati."""
+
+    result = ReconciliationResult(dry_run=dry_run)
+    with transaction.atomic():
+        # le quote indicizzate restano bloccate fino al commit (dove il database lo supporta)
+        index = PendingFeeIndex(lock=not dry_run)
+        if not dry_run:  # un'anteprima non scrive sul registro: non blocca registrazioni e chiusure
+            fiscal.lock_ledger()
+        closing = fiscal.latest_closing()
+        matches: List[Tuple[int, StatementLine]] = []
+        for entry in lines:
+            if closing and entry.date <= closing.end:
+                result.unmatched.append((entry.line, f"Accredito del {entry.date:%d/%m/%Y} in un esercizio chiuso."))
+                continue
+            fee_id = index.match(entry)
+            if fee_id is None:
+                payer = entry.name or entry.email or "ordinante sconosciuto"
+                result.unmatched.append((entry.line, f"Nessuna quota pendente di € {entry.amount} per {payer}."))
+            else:
+                matches.append((fee_id, entry))
+        if not dry_run:
+            for start in range(0, len(matches), batch_size):
+                _record_payments(matches[start:start + batch_size], index.labels)
+
+    for fee_id, entry in matches:
+        result.matched.append((entry.line, index.labels[fee_id]))
+        result.total += entry.amount
+    result.matched.sort()
+    result.unmatched.sort()
+    return result
+
+
+def reconcile_file(file: IO[bytes], filename: str, dry_run: bool = False) -> ReconciliationResult:
+    """Legge l'estratto e lo riconcilia; le righe illeggibili sono riportate tra quelle non abbinate."""
+
+    errors: List[Tuple[int, str]] = []
+    result = reconcile(read_statement(file, filename, errors), dry_run=dry_run)
+    result.unmatched = sorted(result.unmatched + errors)
+    return result
+
+
+def _record_payments(matches: List[Tuple[int, StatementLine]], labels: Dict[int, str]) -> None:
+    fees = [
+        MembershipFee(pk=fee_id, status=MembershipFee.STATUS_PAGATO, payment_date=entry.date)
+        for fee_id, entry in matches
+    ]
+    MembershipFee.objects.bulk_update(fees, ["status", "payment_date"])
+    payments = FinancialTransaction.objects.bulk_create(
+        FinancialTransaction(
+            transaction_type=FinancialTransaction.TYPE_ENTRATA,
+            amount=entry.amount,
+            date=entry.date,
+            description=labels[fee_id],
+        )
+        for fee_id, entry in matches
+    )
+    # bulk_update e bulk_create non inviano segnali: aggiorna riepilogo, statistiche degli iscritti e ricerca
+    member_stats.refresh(Member.objects.filter(fees__pk__in=[fee_id for fee_id, _ in matches]))
+    search.index_objects(payments)
+    reports.invalidate(entry.date for _, entry in matches)
+    total = sum((entry.amount for _, entry in matches), Decimal("0"))
+    summaries.apply_delta(summaries.fee_key(MembershipFee.STATUS_PENDENTE), -len(matches), -total)
+    summaries.apply_delta(summaries.fee_key(MembershipFee.STATUS_PAGATO), len(matches), total)
+    summaries.apply_delta(summaries.transaction_key(FinancialTransaction.TYPE_ENTRATA), len(matches), total)
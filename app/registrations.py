@@ -0,0 +1,85 @@
+"""Iscrizioni agli eventi con posti limitati e lista d'attesa.
+
+Ogni iscrizione avviene in una transazione che blocca la riga dell'evento:
+con ``SELECT ... FOR UPDATE`` dove il database lo supporta, altrimenti (su
+SQLite) con un ``UPDATE`` che non modifica nulla ma acquisisce subito il
+lock di scrittura. Le iscrizioni concorrenti allo stesso evento vengono
+cosi' serializzate e il conteggio dei posti occupati non puo' cambiare tra
+la verifica e l'inserimento; gli eventi diversi non si bloccano a vicenda
+(su PostgreSQL).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from . import caching, event_stats, member_stats
+from .models import Event, Member, Participation
+
+
+@dataclass
+class RegistrationResult:
+    participation: Participation
+    created: bool
+
+    @property
+    def waitlisted(self) -> bool:
+        return self.participation.waitlisted
+
+
+def _lock_event(event_id: int) -> Optional[Event]:
+    """Blocca l'evento fino alla fine della transazione corrente; ``None`` se non esiste."""
+
+    if connection.features.has_select_for_update:
+        return Event.objects.select_for_update().filter(pk=event_id).first()
+    if not Event.objects.filter(pk=event_id).update(capacity=F("capacity")):
+        return None
+    return Event.objects.filter(pk=event_id).first()
+
+
+def confirmed_count(event_id: int) -> int:
+    return Participation.objects.filter(event_id=event_id, waitlisted=False).count()
+
+
+def register(event_id: int, member: Member) -> RegistrationResult:
+    """Iscrive ``member`` all'evento, in lista d'attesa se i posti sono esauriti.
+
+    Solleva ``Event.DoesNotExist`` se l'evento non esiste.
+    """
+
+    with transaction.atomic():
+        event = _lock_event(event_id)
+        if event is None:
+            raise Event.DoesNotExist(f"Evento {event_id} inesistente.")
+        existing = Participation.objects.filter(event=event, member=member).first()
+        if existing is not None:
+            return RegistrationResult(existing, created=False)
+        waitlisted = event.capacity is not None and confirmed_count(event.pk) >= event.capacity
+        participation = Participation.objects.create(event=event, member=member, waitlisted=waitlisted)
+    return RegistrationResult(participation, created=True)
+
+
+def promote_waitlist(event_id: int) -> int:
+    """Conferma, in ordine di iscrizione, i membri in lista d'attesa per cui si e' liberato un posto."""
+
+    with transaction.atomic():
+        event = _lock_event(event_id)
+        if event is None:
+            return 0
+        waiting = Participation.objects.filter(event_id=event_id, waitlisted=True).order_by("registered_at", "id")
+        if event.capacity is not None:
+            free = event.capacity - confirmed_count(event_id)
+            if free <= 0:
+                return 0
+            waiting = waiting[:free]
+        promoted = dict(waiting.values_list("id", "member_id"))
+        if promoted:
+            Participation.objects.filter(pk__in=list(promoted)).update(waitlisted=False)
+            # update() non invia segnali
+            member_stats.apply_delta(Member.objects.filter(pk__in=promoted.values()), events_registered=1)
+            event_stats.apply_delta(event_id, participants_count=len(promoted), waitlist_count=-len(promoted))
+            caching.invalidate_events()
+    return len(promoted)
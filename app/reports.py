@@ -0,0 +1,331 @@
+"""Rendiconto economico per mese, trimestre o anno.
+
+Entrate, uscite e saldo di ogni periodo, con il dettaglio per evento
+collegato, si ottengono con un'unica aggregazione condizionale raggruppata
+per ``Trunc`` della data e per evento. I mesi gia' trascorsi non cambiano
+piu' (salvo correzioni, che invalidano il mese interessato): le loro righe
+sono salvate in cache per anno e granularita', quindi a ogni richiesta si
+ricalcola soltanto il periodo aperto, cioe' il mese in corso.
+
+Le chiavi di cache contengono una versione generale, una per anno (anni
+chiusi) e una per mese (anno in corso): i segnali di
+``FinancialTransaction`` incrementano quelle delle date toccate, le
+operazioni massive chiamano :func:`invalidate`. L'incremento si ripete al
+commit, perche' nel frattempo una richiesta concorrente puo' aver salvato
+i dati precedenti sotto la nuova versione. Con la cache in memoria di ogni
+processo un worker non vede le invalidazioni degli altri, quindi le righe
+scadono dopo :data:`LOCAL_TIMEOUT` secondi; solo con una cache condivisa
+(``ASSOHUB_CACHE_DIR``) restano valide finche' non cambiano. Il saldo di apertura parte
+dall'ultima chiusura d'esercizio precedente (:mod:`app.fiscal`) invece che
+dal primo movimento del registro.
+"""
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth, TruncQuarter, TruncYear
+from django.utils import timezone
+
+from .models import Event, FinancialTransaction, FiscalYearClosing
+
+GRANULARITIES = {"mese": TruncMonth, "trimestre": TruncQuarter, "anno": TruncYear}
+GRANULARITY_CHOICES = [("mese", "Mese"), ("trimestre", "Trimestre"), ("anno", "Anno")]
+MONTHS = ["gen", "feb", "mar", "apr", "mag", "giu", "lug", "ago", "set", "ott", "nov", "dic"]
+GENERATION_KEY = "rendiconto:generazione"
+ZERO = Decimal("0")
+CENT = Decimal("0.01")
+LOCAL_TIMEOUT = 300
+
+# (periodo, evento, entrate, uscite, movimenti)
+Row = Tuple[date, Optional[int], Decimal, Decimal, int]
+
+
+def money(value: Decimal) -> str:
+    """Importo con due decimali (SQLite restituisce le somme senza scala)."""
+
+    return str(value.quantize(CENT))
+
+
+def open_period_start(today: Optional[date] = None) -> date:
+    """Inizio del periodo aperto: il mese in corso. Tutto cio' che precede puo' stare in cache."""
+
+    today = today or timezone.localdate()
+    return today.replace(day=1)
+
+
+def _year_version_key(year: int) -> str:
+    return f"rendiconto:{year}:versione"
+
+
+def _month_version_key(year: int, month: int) -> str:
+    return f"rendiconto:{year}-{month:02d}:versione"
+
+
+def _bump(keys: List[str]) -> None:
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # valore iniziale non riutilizzabile: evita di ritrovare voci di una versione precedente
+            cache.add(key, int(time.time() * 1000), None)
+
+
+def invalidate(dates: Optional[Iterable[date]] = None) -> None:
+    """Rende obsolete le righe in cache che comprendono le date indicate (tutte se ``None``)."""
+
+    if dates is None:
+        keys = [GENERATION_KEY]
+    else:
+        keys = []
+        for year, month in {(value.year, value.month) for value in dates}:
+            keys += [_year_version_key(year), _month_version_key(year, month)]
+    _bump(keys)
+    if transaction.get_connection().in_atomic_block:
+        # una richiesta concorrente potrebbe aver messo in cache i dati precedenti al commit
+        transaction.on_commit(lambda: _bump(keys))
+
+
+def rows_timeout() -> Optional[int]:
+    """Durata delle righe in cache: illimitata solo se la cache e' condivisa tra i processi."""
+
+    backend = settings.CACHES["default"]["BACKEND"]
+    return LOCAL_TIMEOUT if backend == "django.core.cache.backends.locmem.LocMemCache" else None
+
+
+def _cache_keys(granularity: str, by_event: bool, years: List[int], split: date) -> Dict[int, str]:
+    """Chiave di ogni anno: versionata per anno se e' chiuso, per mese se e' quello del periodo aperto."""
+
+    version_keys = [GENERATION_KEY] + [_year_version_key(year) for year in years]
+    version_keys += [_month_version_key(split.year, month) for month in range(1, split.month)]
+    versions = cache.get_many(version_keys)
+    prefix = f"rendiconto:{versions.get(GENERATION_KEY, 0)}:{granularity}:{'eventi' if by_event else 'totali'}"
+    keys = {}
+    for year in years:
+        if year < split.year:
+            keys[year] = f"{prefix}:{year}:{versions.get(_year_version_key(year), 0)}"
+        else:
+            months = "-".join(str(versions.get(_month_version_key(year, month), 0)) for month in range(1, split.month))
+            keys[year] = f"{prefix}:{year}-{split.month:02d}:{months}"
+    return keys
+
+
+def _row_order(row: dict) -> tuple:
+    # i movimenti senza evento per primi, su qualunque database
+    return row["period"], row.get("event_id") is not None, row.get("event_id") or 0
+
+
+def _query(granularity: str, by_event: bool, start: date, end: date) -> Dict[int, List[Row]]:
+    """Righe per periodo (ed evento) dei movimenti tra ``start`` (incluso) ed ``end`` (escluso), con una query."""
+
+    income = Q(transaction_type=FinancialTransaction.TYPE_ENTRATA)
+    expense = Q(transaction_type=FinancialTransaction.TYPE_USCITA)
+    rows = (
+        FinancialTransaction.objects.filter(date__gte=start, date__lt=end)
+        .annotate(period=GRANULARITIES[granularity]("date"))
+        .order_by()
+        .values("period", *(["event_id"] if by_event else []))
+        .annotate(
+            income=Sum("amount", filter=income, default=ZERO),
+            expense=Sum("amount", filter=expense, default=ZERO),
+            count=Count("id"),
+        )
+    )
+    by_year: Dict[int, List[Row]] = defaultdict(list)
+    for row in sorted(rows, key=_row_order):
+        by_year[row["period"].year].append(
+            (row["period"], row.get("event_id"), row["income"], row["expense"], row["count"])
+        )
+    return by_year
+
+
+def _merge(first: List[Row], second: List[Row]) -> List[Row]:
+    """Somma le righe con lo stesso periodo ed evento (un trimestre o un anno a cavallo del periodo aperto)."""
+
+    totals: Dict[Tuple[date, Optional[int]], List] = {}
+    for period, event_id, income, expense, count in first + second:
+        row = totals.setdefault((period, event_id), [ZERO, ZERO, 0])
+        row[0] += income
+        row[1] += expense
+        row[2] += count
+    merged = [(period, event_id, *values) for (period, event_id), values in totals.items()]
+    return sorted(merged, key=lambda row: _row_order({"period": row[0], "event_id": row[1]}))
+
+
+def year_rows(granularity: str, years: List[int], by_event: bool = False) -> Dict[int, List[Row]]:
+    """Righe degli anni richiesti, per evento solo con ``by_event``.
+
+    I mesi che precedono il periodo aperto vengono dalla cache (o da un'unica
+    query per tutti gli anni mancanti); il periodo aperto e' sempre ricalcolato.
+    """
+
+    if not years:
+        return {}
+    split = open_period_start()
+    cacheable = [year for year in years if date(year, 1, 1) < split]
+    keys = _cache_keys(granularity, by_event, cacheable, split) if cacheable else {}
+    cached = cache.get_many(keys.values())
+    result = {year: cached[keys[year]] for year in cacheable if keys[year] in cached}
+    missing = [year for year in cacheable if year not in result]
+    if missing:
+        end = min(date(max(missing) + 1, 1, 1), split)
+        fetched = _query(granularity, by_event, date(min(missing), 1, 1), end)
+        for year in missing:
+            result[year] = fetched.get(year, [])
+        cache.set_many({keys[year]: result[year] for year in missing}, rows_timeout())
+    if years[-1] >= split.year:
+        live = _query(granularity, by_event, max(split, date(years[0], 1, 1)), date(years[-1] + 1, 1, 1))
+        for year in years:
+            if year >= split.year:
+                result[year] = _merge(result.get(year, []), live.get(year, []))
+    return result
+
+
+@dataclass
+class EventFigures:
+    event_id: Optional[int]
+    title: str
+    income: Decimal = ZERO
+    expense: Decimal = ZERO
+    count: int = 0
+
+    @property
+    def net(self) -> Decimal:
+        return self.income - self.expense
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "event_id": self.event_id,
+            "event": self.title,
+            "income": money(self.income),
+            "expense": money(self.expense),
+            "net": money(self.net),
+            "count": self.count,
+        }
+
+
+@dataclass
+class Period:
+    start: date
+    label: str
+    income: Decimal = ZERO
+    expense: Decimal = ZERO
+    count: int = 0
+    balance: Decimal = ZERO  # saldo progressivo a fine periodo
+    events: List[EventFigures] = field(default_factory=list)
+
+    @property
+    def net(self) -> Decimal:
+        return self.income - self.expense
+
+    def as_dict(self) -> Dict[str, object]:
+        data = {
+            "period": self.start.isoformat(),
+            "label": self.label,
+            "income": money(self.income),
+            "expense": money(self.expense),
+            "net": money(self.net),
+            "balance": money(self.balance),
+            "count": self.count,
+        }
+        if self.events:
+            data["events"] = [figures.as_dict() for figures in self.events]
+        return data
+
+
+@dataclass
+class Report:
+    granularity: str
+    first_year: int
+    last_year: int
+    by_event: bool
+    opening_balance: Decimal
+    periods: List[Period]
+
+    @property
+    def income(self) -> Decimal:
+        return sum((period.income for period in self.periods), ZERO)
+
+    @property
+    def expense(self) -> Decimal:
+        return sum((period.expense for period in self.periods), ZERO)
+
+    @property
+    def closing_balance(self) -> Decimal:
+        return self.opening_balance + self.income - self.expense
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "granularity": self.granularity,
+            "first_year": self.first_year,
+            "last_year": self.last_year,
+            "opening_balance": money(self.opening_balance),
+            "income": money(self.income),
+            "expense": money(self.expense),
+            "closing_balance": money(self.closing_balance),
+            "periods": [period.as_dict() for period in self.periods],
+        }
+
+
+def period_label(granularity: str, start: date) -> str:
+    if granularity == "anno":
+        return str(start.year)
+    if granularity == "trimestre":
+        return f"T{(start.month - 1) // 3 + 1} {start.year}"
+    return f"{MONTHS[start.month - 1]} {start.year}"
+
+
+def opening_balance(year: int) -> Decimal:
+    """Saldo all'inizio di ``year``: saldo finale dell'ultimo esercizio chiuso piu' i saldi annuali successivi."""
+
+    closing = FiscalYearClosing.objects.filter(year__lt=year).order_by("-year").first()
+    if closing:
+        first_year, balance = closing.year + 1, closing.closing_balance
+    else:
+        first = FinancialTransaction.objects.order_by("date").values_list("date", flat=True).first()
+        if first is None or first.year >= year:
+            return ZERO
+        first_year, balance = first.year, ZERO
+    rows = year_rows("anno", list(range(first_year, year)))
+    nets = (income - expense for year_list in rows.values() for _, _, income, expense, _ in year_list)
+    return balance + sum(nets, ZERO)
+
+
+def build_report(granularity: str, first_year: int, last_year: int, by_event: bool = False) -> Report:
+    """Rendiconto da ``first_year`` a ``last_year`` (inclusi) con la granularita' indicata."""
+
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularita' non valida: {granularity!r}.")
+    years = list(range(first_year, last_year + 1))
+    rows = year_rows(granularity, years, by_event)
+    opening = opening_balance(first_year)
+    periods: Dict[date, Period] = {}
+    event_ids = set()
+    for year in years:
+        for start, event_id, income, expense, count in rows[year]:
+            period = periods.setdefault(start, Period(start=start, label=period_label(granularity, start)))
+            period.income += income
+            period.expense += expense
+            period.count += count
+            if by_event:
+                period.events.append(EventFigures(event_id, "", income, expense, count))
+                event_ids.add(event_id)
+    if by_event:
+        titles = dict(Event.objects.filter(pk__in=event_ids - {None}).values_list("id", "title"))
+        for period in periods.values():
+            for figures in period.events:
+                figures.title = titles.get(figures.event_id, "Senza evento")
+    balance = opening
+    ordered = sorted(periods.values(), key=lambda period: period.start)
+    for period in ordered:
+        balance += period.net
+        period.balance = balance
+    return Report(granularity, first_year, last_year, by_event, opening, ordered)
@@ -0,0 +1,250 @@
+"""Ricerca full-text globale su iscritti, eventi e movimenti.
+
+Ogni oggetto indicizzato ha una riga in :class:`~app.models.SearchDocument`
+con il testo gia' normalizzato; i segnali la tengono allineata e le
+operazioni massive chiamano :func:`index_objects`. Il database mantiene da
+solo l'indice vero e proprio, creato dalla migrazione ``0008_search_document``:
+
+* su SQLite una tabella virtuale FTS5 ``app_search_fts`` a contenuto esterno,
+  aggiornata da trigger e ordinata con ``bm25``;
+* su PostgreSQL una colonna ``tsvector`` generata con indice GIN, ordinata
+  con ``ts_rank``;
+* altrove (o su SQLite compilato senza FTS5) si ripiega su ``LIKE``.
+
+In tutti i casi ogni parola cercata vale come prefisso e il titolo pesa
+piu' del resto del testo.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Event, FinancialTransaction, Member, SearchDocument, normalize_search
+
+BATCH_SIZE = 500
+MAX_TERMS = 8
+TITLE_WEIGHT = 10.0
+
+# campi che, se modificati, richiedono di aggiornare il documento
+INDEXED_FIELDS = {
+    Member: {"first_name", "last_name", "email", "phone"},
+    Event: {"title", "description", "location", "date"},
+    FinancialTransaction: {"description", "transaction_type", "amount", "date"},
+}
+KINDS = {
+    "member": SearchDocument.KIND_MEMBER,
+    "event": SearchDocument.KIND_EVENT,
+    "financialtransaction": SearchDocument.KIND_TRANSACTION,
+}
+TRANSACTION_LABELS = dict(FinancialTransaction.TYPE_CHOICES)
+RESULT_URLS = {
+    SearchDocument.KIND_MEMBER: ("member_update", "pk"),
+    SearchDocument.KIND_EVENT: ("event_update", "pk"),
+}
+
+
+def backend() -> str:
+    """``"postgresql"``, ``"fts5"`` o ``"like"`` a seconda del database in uso."""
+
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor == "postgresql":
+        return "postgresql"
+    if connection.vendor != "sqlite":
+        return "like"
+    if not hasattr(connection, "assohub_fts5"):  # una verifica per connessione
+        connection.assohub_fts5 = "app_search_fts" in connection.introspection.table_names()
+    return "fts5" if connection.assohub_fts5 else "like"
+
+
+def _fit(document):
+    """Tronca titolo e dettaglio alla lunghezza delle colonne (nome e cognome arrivano a 301 caratteri)."""
+
+    for name in ("title", "detail"):
+        max_length = document._meta.get_field(name).max_length
+        value = getattr(document, name)
+        if len(value) > max_length:
+            setattr(document, name, value[: max_length - 1] + "…")
+    return document
+
+
+def build_document(instance) -> SearchDocument:
+    """Documento di ricerca di un iscritto, evento o movimento."""
+
+    kind = KINDS.get(instance._meta.model_name)
+    if kind == SearchDocument.KIND_MEMBER:
+        name = f"{instance.first_name} {instance.last_name}".strip()
+        document = SearchDocument(
+            kind=kind,
+            object_id=instance.pk,
+            title=name,
+            detail=instance.email,
+            title_terms=normalize_search(name),
+            body_terms=normalize_search(f"{instance.email} {instance.phone}"),
+        )
+    elif kind == SearchDocument.KIND_EVENT:
+        when = timezone.localtime(instance.date) if timezone.is_aware(instance.date) else instance.date
+        document = SearchDocument(
+            kind=kind,
+            object_id=instance.pk,
+            title=instance.title,
+            detail=f"{when:%d/%m/%Y} - {instance.location}",
+            title_terms=normalize_search(instance.title),
+            body_terms=normalize_search(f"{instance.location} {instance.description}"),
+        )
+    elif kind == SearchDocument.KIND_TRANSACTION:
+        label = TRANSACTION_LABELS.get(instance.transaction_type, instance.transaction_type)
+        document = SearchDocument(
+            kind=kind,
+            object_id=instance.pk,
+            title=instance.description,
+            detail=f"{label} € {instance.amount} - {instance.date:%d/%m/%Y}",
+            title_terms=normalize_search(instance.description),
+            body_terms=normalize_search(label),
+        )
+    else:
+        raise TypeError(f"{type(instance).__name__} non e' indicizzabile.")
+    return _fit(document)
+
+
+def index_object(instance) -> None:
+    """Crea o aggiorna il documento di un singolo oggetto."""
+
+    document = build_document(instance)
+    values = {name: getattr(document, name) for name in ("title", "detail", "title_terms", "body_terms")}
+    SearchDocument.objects.update_or_create(kind=document.kind, object_id=document.object_id, defaults=values)
+
+
+def remove_object(instance) -> None:
+    kind = KINDS[instance._meta.model_name]
+    SearchDocument.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def index_objects(objects: Iterable, batch_size: int = BATCH_SIZE) -> int:
+    """(Re)indicizza in blocco oggetti creati o modificati senza segnali (``bulk_create``, ``update``)."""
+
+    created = 0
+    batch: List[SearchDocument] = []
+
+    def flush() -> None:
+        by_kind: Dict[str, List[int]] = {}
+        for document in batch:
+            by_kind.setdefault(document.kind, []).append(document.object_id)
+        for kind, object_ids in by_kind.items():
+            SearchDocument.objects.filter(kind=kind, object_id__in=object_ids).delete()
+        SearchDocument.objects.bulk_create(batch)
+
+    with transaction.atomic():
+        for instance in objects:
+            batch.append(build_document(instance))
+            if len(batch) == batch_size:
+                flush()
+                created += len(batch)
+                batch = []
+        if batch:
+            flush()
+            created += len(batch)
+    return created
+
+
+def rebuild() -> Dict[str, int]:
+    """Ricostruisce da zero tutti i documenti e l'indice full-text."""
+
+    counts = {}
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        for kind, queryset in (
+            (SearchDocument.KIND_MEMBER, Member.objects.order_by("pk")),
+            (SearchDocument.KIND_EVENT, Event.objects.order_by("pk")),
+            (SearchDocument.KIND_TRANSACTION, FinancialTransaction.objects.order_by("pk")),
+        ):
+            documents = (build_document(instance) for instance in queryset.iterator(chunk_size=2000))
+            counts[kind] = len(SearchDocument.objects.bulk_create(documents, batch_size=BATCH_SIZE))
+        if backend() == "fts5":
+            with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+                cursor.execute("INSERT INTO app_search_fts(app_search_fts) VALUES ('optimize')")
+    return counts
+
+
+@dataclass
+class SearchResult:
+    kind: str
+    object_id: int
+    title: str
+    detail: str
+    label: str
+    url: str
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "kind": self.kind,
+            "id": self.object_id,
+            "title": self.title,
+            "detail": self.detail,
+            "url": self.url,
+        }
+
+
+def terms(text: str) -> List[str]:
+    """Parole cercate, normalizzate come il testo indicizzato."""
+
+    return re.findall(r"\w+", normalize_search(text))[:MAX_TERMS]
+
+
+def _result(document: SearchDocument) -> SearchResult:
+    route = RESULT_URLS.get(document.kind)
+    url = reverse(route[0], kwargs={route[1]: document.object_id}) if route else reverse("transactions_list")
+    return SearchResult(
+        kind=document.kind,
+        object_id=document.object_id,
+        title=document.title,
+        detail=document.detail,
+        label=document.get_kind_display(),
+        url=url,
+    )
+
+
+def search(text: str, kind: Optional[str] = None, limit: int = 20) -> List[SearchResult]:
+    """I ``limit`` documenti piu' pertinenti che contengono tutte le parole di ``text`` (come prefissi)."""
+
+    words = terms(text)
+    if not words:
+        return []
+    columns = "d.id, d.kind, d.object_id, d.title, d.detail, d.title_terms, d.body_terms"
+    kind_filter = "AND d.kind = %s" if kind else ""
+    kind_params = [kind] if kind else []
+    engine = backend()
+    if engine == "fts5":
+        query = " AND ".join(f'"{word}"*' for word in words)
+        documents = SearchDocument.objects.raw(
+            f"""
+            SELECT {columns} FROM app_search_fts JOIN app_searchdocument d ON d.id = app_search_fts.rowid
+            WHERE app_search_fts MATCH %s {kind_filter}
+            ORDER BY bm25(app_search_fts, {TITLE_WEIGHT}, 1.0), d.id LIMIT %s
+            """,
+            [query, *kind_params, limit],
+        )
+    elif engine == "postgresql":
+        query = " & ".join(f"{word}:*" for word in words)
+        documents = SearchDocument.objects.raw(
+            f"""
+            SELECT {columns} FROM app_searchdocument d, to_tsquery('simple', %s) query
+            WHERE d.search_vector @@ query {kind_filter}
+            ORDER BY ts_rank(d.search_vector, query) DESC, d.id LIMIT %s
+            """,
+            [query, *kind_params, limit],
+        )
+    else:
+        condition = Q()
+        for word in words:
+            condition &= Q(title_terms__contains=word) | Q(body_terms__contains=word)
+        documents = SearchDocument.objects.filter(condition)
+        if kind:
+            documents = documents.filter(kind=kind)
+        documents = documents.order_by("title", "id")[:limit]
+    return [_result(document) for document in documents]
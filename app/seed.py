@@ -0,0 +1,176 @@
+"""Generatore di dati sintetici per test di carico e benchmark.
+
+Tutte le righe vengono create con ``bulk_create`` e la generazione e'
+riproducibile a parita' di ``random_seed``. Le chiamate successive
+aggiungono dati a quelli esistenti senza violare i vincoli di unicita'.
+"""
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from typing import Tuple
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, event_stats, member_stats, reports, search, summaries
+from .models import Event, FinancialTransaction, Member, MembershipFee, Participation, User
+
+FIRST_NAMES = ["Mario", "Laura", "Giulia", "Luca", "Anna", "Marco", "Sara", "Paolo", "Elena", "Davide"]
+LAST_NAMES = ["Rossi", "Bianchi", "Verdi", "Neri", "Russo", "Ferrari", "Esposito", "Romano", "Gallo", "Conti"]
+DEFAULT_PASSWORD = "password123"
+BATCH_SIZE = 1000
+
+
+@dataclass
+class SeedResult:
+    members: int = 0
+    users: int = 0
+    fees: int = 0
+    events: int = 0
+    participations: int = 0
+    transactions: int = 0
+
+
+def create_accounts(password: str = DEFAULT_PASSWORD) -> Tuple[User, User]:
+    """Crea (se mancanti) un amministratore e un associato con iscritto collegato."""
+
+    accounts = []
+    with User.bulk_creation():
+        for username, role in (("admin", Member.ROLE_AMMINISTRATORE), ("associato", Member.ROLE_ASSOCIATO)):
+            user = User.objects.filter(username=username).select_related("member").first()
+            if user is None:
+                member = Member.objects.create(
+                    first_name=username.title(),
+                    last_name="Benchmark",
+                    email=f"{username}@benchmark.assohub",
+                    role=role,
+                )
+                user = User.objects.create_user(username=username, password=password, member=member, role=role)
+            accounts.append(user)
+    return accounts[0], accounts[1]
+
+
+@transaction.atomic
+def seed_association(
+    members: int = 100,
+    users: int | None = None,
+    events: int = 20,
+    participations_per_event: int = 10,
+    transactions: int = 200,
+    fee_years: int = 1,
+    random_seed: int = 0,
+    password: str = DEFAULT_PASSWORD,
+) -> SeedResult:
+    """Aggiunge al database un'associazione sintetica delle dimensioni richieste."""
+
+    rng = random.Random(random_seed)
+    result = SeedResult()
+    now = timezone.now()
+    offset = Member.objects.count()
+
+    new_members = [
+        Member(
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=f"{rng.choice(LAST_NAMES)}{index}",
+            email=f"socio{index}@example.com",
+            phone=f"+39 3{rng.randint(10, 99)} {rng.randint(1000000, 9999999)}",
+            active=rng.random() > 0.1,
+        )
+        for index in range(offset, offset + members)
+    ]
+    for member in new_members:
+        member.update_search_fields()  # bulk_create non chiama save()
+    new_members = Member.objects.bulk_create(new_members, batch_size=BATCH_SIZE)
+    result.members = len(new_members)
+
+    users = members if users is None else min(users, members)
+    password_hash = make_password(password)  # un solo hash: il costo dell'algoritmo non conta qui
+    created_users = User.objects.bulk_create(
+        (
+            User(
+                username=f"socio{offset + index}",
+                password=password_hash,
+                email=member.email,
+                first_name=member.first_name,
+                last_name=member.last_name,
+                role=member.role,
+                member=member,
+            )
+            for index, member in enumerate(new_members[:users])
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    result.users = len(created_users)
+
+    current_year = now.year
+    fees = MembershipFee.objects.bulk_create(
+        (
+            MembershipFee(
+                member=member,
+                year=current_year - shift,
+                amount=Decimal("30.00"),
+                status=MembershipFee.STATUS_PAGATO if shift or rng.random() > 0.4 else MembershipFee.STATUS_PENDENTE,
+                payment_date=(now - timedelta(days=365 * shift)).date() if shift else None,
+            )
+            for member in new_members
+            for shift in range(fee_years)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    result.fees = len(fees)
+
+    new_events = Event.objects.bulk_create(
+        (
+            Event(
+                title=f"Evento {rng.randint(1, 10 ** 6)}",
+                description="Incontro generato automaticamente.",
+                date=now + timedelta(days=rng.randint(-365, 365), hours=rng.randint(0, 23)),
+                location=rng.choice(["Sede centrale", "Palestra", "Auditorium", "Parco"]),
+            )
+            for _ in range(events)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    result.events = len(new_events)
+
+    participations = []
+    if new_members:
+        for event in new_events:
+            sample = rng.sample(new_members, min(participations_per_event, len(new_members)))
+            participations += [
+                Participation(member=member, event=event, presence=event.date < now and rng.random() > 0.3)
+                for member in sample
+            ]
+    Participation.objects.bulk_create(participations, batch_size=BATCH_SIZE)
+    result.participations = len(participations)
+
+    linked_events = new_events or [None]
+    ledger = FinancialTransaction.objects.bulk_create(
+        (
+            FinancialTransaction(
+                transaction_type=rng.choice([FinancialTransaction.TYPE_ENTRATA, FinancialTransaction.TYPE_USCITA]),
+                amount=Decimal(rng.randint(100, 50000)) / 100,
+                date=(now - timedelta(days=rng.randint(0, 5 * 365))).date(),
+                description=f"Movimento {rng.randint(1, 10 ** 6)}",
+                event=rng.choice(linked_events) if rng.random() > 0.5 else None,
+            )
+            for _ in range(transactions)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    result.transactions = len(ledger)
+
+    # bulk_create non invia segnali: riallinea i dati denormalizzati
+    summaries.rebuild()
+    member_stats.refresh()
+    event_stats.refresh(Event.objects.filter(pk__in=[event.pk for event in new_events]))
+    search.index_objects(new_members)
+    search.index_objects(new_events)
+    search.index_objects(ledger)
+    caching.invalidate_events()
+    reports.invalidate()
+    return result
@@ -0,0 +1,245 @@
+"""Ricevitori dei segnali che mantengono aggiornati i dati denormalizzati."""
+from __future__ import annotations
+
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import caching, event_stats, fiscal, member_stats, registrations, reports, search, summaries
+from .models import Event, FinancialTransaction, FiscalYearClosing, Member, MembershipFee, Participation, User
+
+TRACKED_FIELDS = {
+    Member: ("active", "role"),
+    Event: ("capacity",),
+    FinancialTransaction: ("transaction_type", "amount", "date", "event_id"),
+    MembershipFee: ("member_id", "status", "amount"),
+    Participation: ("event_id", "member_id", "presence", "waitlisted"),
+    User: ("member_id", "role"),
+}
+
+
+def _remember(instance) -> None:
+    fields = TRACKED_FIELDS[type(instance)]
+    # usa __dict__ per non caricare eventuali campi differiti
+    instance._tracked_values = {field: instance.__dict__[field] for field in fields if field in instance.__dict__}
+
+
+def _previous(instance) -> dict | None:
+    """Valori salvati nel database prima della modifica corrente."""
+
+    if instance._state.adding:
+        return None
+    previous = getattr(instance, "_tracked_values", {})
+    fields = TRACKED_FIELDS[type(instance)]
+    if len(previous) < len(fields):
+        previous = type(instance)._default_manager.filter(pk=instance.pk).values(*fields).first()
+    return previous
+
+
+@receiver(post_init, sender=Member)
+@receiver(post_init, sender=Event)
+@receiver(post_init, sender=FinancialTransaction)
+@receiver(post_init, sender=MembershipFee)
+@receiver(post_init, sender=Participation)
+@receiver(post_init, sender=User)
+def remember_tracked_values(sender, instance, **kwargs):
+    _remember(instance)
+
+
+@receiver(pre_save, sender=Member)
+@receiver(pre_save, sender=Event)
+@receiver(pre_save, sender=FinancialTransaction)
+@receiver(pre_save, sender=MembershipFee)
+@receiver(pre_save, sender=Participation)
+@receiver(pre_save, sender=User)
+def load_previous_values(sender, instance, **kwargs):
+    instance._previous_values = _previous(instance)
+
+
+@receiver(pre_save, sender=FinancialTransaction)
+def protect_closed_years(sender, instance: FinancialTransaction, **kwargs):
+    # registrato dopo load_previous_values: controlla anche la data prima della modifica
+    previous = instance._previous_values
+    fiscal.guard([instance.date, previous and previous.get("date")])
+
+
+@receiver(pre_delete, sender=FinancialTransaction)
+def protect_closed_transaction(sender, instance: FinancialTransaction, **kwargs):
+    fiscal.guard([instance.date])
+
+
+@receiver(pre_delete, sender=Event)
+def protect_closed_event_transactions(sender, instance: Event, **kwargs):
+    # on_delete=SET_NULL aggiorna i movimenti con un UPDATE massivo che non passa da protect_closed_years
+    fiscal.ensure_event_deletable(instance.pk)
+
+
+@receiver(pre_save, sender=FiscalYearClosing)
+@receiver(pre_delete, sender=FiscalYearClosing)
+def protect_closing(sender, instance: FiscalYearClosing, **kwargs):
+    if not instance._state.adding:
+        raise fiscal.ClosedYearError(f"La chiusura dell'esercizio {instance.year} non si modifica.")
+
+
+@receiver(post_save, sender=Member)
+def member_saved(sender, instance: Member, created: bool, **kwargs):
+    previous = instance._previous_values
+    was_active = bool(previous and previous["active"])
+    if instance.active != was_active:
+        summaries.apply_delta(summaries.ACTIVE_MEMBERS_KEY, 1 if instance.active else -1)
+    if previous and previous["role"] != instance.role:
+        user = instance.user if Member.user.is_cached(instance) else None
+        _sync_role(User.objects.filter(member_id=instance.pk), instance.role, user)
+    _remember(instance)
+
+
+@receiver(post_delete, sender=Member)
+def member_deleted(sender, instance: Member, **kwargs):
+    if instance.active:
+        summaries.apply_delta(summaries.ACTIVE_MEMBERS_KEY, -1)
+
+
+def _sync_role(queryset, role: str, cached=None) -> None:
+    """Allinea il ruolo dell'utente o dell'iscritto collegato con un solo ``UPDATE`` condizionale.
+
+    ``cached`` e' l'istanza collegata gia' in memoria, se c'e': se ha gia' il
+    ruolo giusto non serve nessuna query, altrimenti viene aggiornata anche lei.
+    """
+
+    if cached is not None:
+        if cached.role == role:
+            return
+        cached.role = role
+        _remember(cached)
+        if isinstance(cached, User):
+            cached.forget_memoized()
+    # update() non invia segnali: niente rimbalzo tra utente e iscritto
+    queryset.exclude(role=role).update(role=role)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance: User, created: bool, **kwargs):
+    previous = instance._previous_values
+    changed = previous is None or previous != {"member_id": instance.member_id, "role": instance.role}
+    if instance.member_id and changed:
+        member = instance.member if User.member.is_cached(instance) else None
+        _sync_role(Member.objects.filter(pk=instance.member_id), instance.role, member)
+    _remember(instance)
+
+
+@receiver(post_save, sender=Event)
+def event_saved(sender, instance: Event, created: bool, **kwargs):
+    if created:
+        summaries.apply_delta(summaries.EVENTS_KEY, 1)
+    else:
+        previous = instance._previous_values
+        if previous and previous["capacity"] != instance.capacity:
+            registrations.promote_waitlist(instance.pk)
+    _remember(instance)
+
+
+@receiver(post_delete, sender=Event)
+def event_deleted(sender, instance: Event, **kwargs):
+    summaries.apply_delta(summaries.EVENTS_KEY, -1)
+    reports.invalidate()  # i movimenti collegati restano senza evento
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=Participation)
+@receiver(post_delete, sender=Participation)
+def invalidate_event_pages(sender, instance, **kwargs):
+    caching.invalidate_events()
+
+
+@receiver(post_save, sender=Participation)
+def participation_saved(sender, instance: Participation, created: bool, **kwargs):
+    previous = instance._previous_values
+    before_member, before, before_event, before_event_stats = None, {}, None, {}
+    if previous:
+        before_member = previous["member_id"]
+        before = member_stats.participation_stats(previous["waitlisted"], previous["presence"])
+        before_event = previous["event_id"]
+        before_event_stats = event_stats.participation_stats(previous["waitlisted"], previous["presence"])
+    after = member_stats.participation_stats(instance.waitlisted, instance.presence)
+    member_stats.transfer(before_member, before, instance.member_id, after)
+    after_event_stats = event_stats.participation_stats(instance.waitlisted, instance.presence)
+    event_stats.transfer(before_event, before_event_stats, instance.event_id, after_event_stats)
+    _remember(instance)
+
+
+@receiver(post_delete, sender=Participation)
+def participation_deleted(sender, instance: Participation, **kwargs):
+    stats = member_stats.participation_stats(instance.waitlisted, instance.presence)
+    member_stats.transfer(instance.member_id, stats, None, {})
+    stats = event_stats.participation_stats(instance.waitlisted, instance.presence)
+    event_stats.transfer(instance.event_id, stats, None, {})
+    if not instance.waitlisted:
+        registrations.promote_waitlist(instance.event_id)
+
+
+@receiver(post_save, sender=FinancialTransaction)
+def transaction_saved(sender, instance: FinancialTransaction, created: bool, **kwargs):
+    previous = instance._previous_values
+    if previous:
+        current = {"transaction_type": instance.transaction_type, "amount": summaries.as_decimal(instance.amount)}
+        if {name: previous[name] for name in current} == current:
+            _remember(instance)
+            return
+        summaries.apply_delta(summaries.transaction_key(previous["transaction_type"]), -1, -previous["amount"])
+    summaries.apply_delta(summaries.transaction_key(instance.transaction_type), 1, instance.amount)
+    _remember(instance)
+
+
+@receiver(post_save, sender=FinancialTransaction)
+@receiver(post_delete, sender=FinancialTransaction)
+def invalidate_reports(sender, instance: FinancialTransaction, **kwargs):
+    dates = [instance.date]
+    previous = getattr(instance, "_previous_values", None)
+    if previous and previous.get("date"):
+        dates.append(previous["date"])  # movimento spostato in un altro mese
+    reports.invalidate(dates)
+
+
+@receiver(post_delete, sender=FinancialTransaction)
+def transaction_deleted(sender, instance: FinancialTransaction, **kwargs):
+    amount = summaries.as_decimal(instance.amount)
+    summaries.apply_delta(summaries.transaction_key(instance.transaction_type), -1, -amount)
+
+
+@receiver(post_save, sender=MembershipFee)
+def fee_saved(sender, instance: MembershipFee, created: bool, **kwargs):
+    previous = instance._previous_values
+    amount = summaries.as_decimal(instance.amount)
+    before_member, before = None, {}
+    if previous:
+        current = {"member_id": instance.member_id, "status": instance.status, "amount": amount}
+        if previous == current:
+            return
+        summaries.apply_delta(summaries.fee_key(previous["status"]), -1, -previous["amount"])
+        before_member, before = previous["member_id"], member_stats.fee_stats(previous["status"], previous["amount"])
+    summaries.apply_delta(summaries.fee_key(instance.status), 1, amount)
+    member_stats.transfer(before_member, before, instance.member_id, member_stats.fee_stats(instance.status, amount))
+    _remember(instance)
+
+
+@receiver(post_delete, sender=MembershipFee)
+def fee_deleted(sender, instance: MembershipFee, **kwargs):
+    amount = summaries.as_decimal(instance.amount)
+    summaries.apply_delta(summaries.fee_key(instance.status), -1, -amount)
+    member_stats.transfer(instance.member_id, member_stats.fee_stats(instance.status, amount), None, {})
+
+
+@receiver(post_save, sender=Member)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=FinancialTransaction)
+def index_for_search(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not search.INDEXED_FIELDS[sender] & set(update_fields):
+        return
+    search.index_object(instance)
+
+
+@receiver(post_delete, sender=Member)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=FinancialTransaction)
+def remove_from_search(sender, instance, **kwargs):
+    search.remove_object(instance)
@@ -26,5 +26,57 @@
                 applyTheme(nextTheme);
             });
         }
+
+        setupCheckin();
     });
+
+    // Check-in agli eventi: invia i codici in gruppo e mostra solo la differenza restituita dal server
+    function setupCheckin() {
+        const form = document.getElementById('checkin-form');
+        if (!form) {
+            return;
+        }
+        const codes = document.getElementById('checkin-codes');
+        const present = document.getElementById('checkin-present');
+        const log = document.getElementById('checkin-log');
+        const labels = {
+            changed: 'aggiornati',
+            unchanged: 'gia registrati',
+            waitlisted: "in lista d'attesa",
+            not_registered: 'non iscritti',
+            invalid: 'codici non validi',
+        };
+
+        form.addEventListener('submit', async (event) => {
+            event.preventDefault();
+            const values = codes.value.split(/[\s,;]+/).filter(Boolean);
+            if (!values.length) {
+                return;
+            }
+            const response = await fetch(form.dataset.url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': form.querySelector('[name=csrfmiddlewaretoken]').value,
+                },
+                body: JSON.stringify({codes: values, presence: form.presence.value === '1'}),
+            });
+            const diff = await response.json();
+            const item = document.createElement('li');
+            item.className = 'list-group-item';
+            if (!response.ok) {
+                item.classList.add('list-group-item-danger');
+                item.textContent = diff.error;
+            } else {
+                present.textContent = diff.present;
+                codes.value = '';
+                item.textContent = Object.keys(labels)
+                    .filter((key) => diff[key].length)
+                    .map((key) => `${labels[key]}: ${diff[key].join(', ')}`)
+                    .join(' · ');
+            }
+            log.prepend(item);
+            codes.focus();
+        });
+    }
 })();
@@ -0,0 +1,181 @@
+"""Riepilogo materializzato dei totali mostrati in dashboard.
+
+Ogni riga di :class:`FinancialSummary` e' identificata da una chiave
+(``movimenti:entrata``, ``quote:pendente``, ...) e viene aggiornata con
+incrementi atomici dai segnali dei modelli, cosi' la dashboard non deve
+ricalcolare aggregati sull'intero archivio a ogni richiesta. I movimenti
+degli esercizi chiusi sono riassunti dall'ultima chiusura (vedi
+:mod:`app.fiscal`): ricostruzione, verifica e totali del registro
+aggregano soltanto il periodo aperto.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Dict, List, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F, Q, QuerySet, Sum
+
+from . import fiscal
+from .models import Event, FinancialSummary, FinancialTransaction, Member, MembershipFee
+
+ACTIVE_MEMBERS_KEY = "iscritti:attivi"
+EVENTS_KEY = "eventi:totale"
+
+Figures = Dict[str, Tuple[int, Decimal]]
+
+
+def transaction_key(transaction_type: str) -> str:
+    return f"movimenti:{transaction_type}"
+
+
+def fee_key(status: str) -> str:
+    return f"quote:{status}"
+
+
+def all_keys() -> List[str]:
+    keys = [ACTIVE_MEMBERS_KEY, EVENTS_KEY]
+    keys += [transaction_key(value) for value, _ in FinancialTransaction.TYPE_CHOICES]
+    keys += [fee_key(value) for value, _ in MembershipFee.STATUS_CHOICES]
+    return keys
+
+
+def as_decimal(value) -> Decimal:
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def apply_delta(key: str, count: int = 0, total: Decimal | int = 0) -> None:
+    """Somma ``count`` e ``total`` alla riga indicata con un singolo UPDATE."""
+
+    if not count and not total:
+        return
+    total = as_decimal(total)
+    updated = FinancialSummary.objects.filter(key=key).update(
+        count=F("count") + count, total=F("total") + total
+    )
+    if not updated:
+        FinancialSummary.objects.get_or_create(key=key)
+        FinancialSummary.objects.filter(key=key).update(count=F("count") + count, total=F("total") + total)
+
+
+def _transaction_figures() -> Figures:
+    closing = fiscal.latest_closing()
+    open_figures = fiscal.figures(fiscal.open_transactions(closing))
+    income, expense = open_figures["income"], open_figures["expense"]
+    income_count, expense_count = open_figures["income_count"], open_figures["expense_count"]
+    if closing:
+        income, expense = income + closing.total_income, expense + closing.total_expense
+        income_count += closing.total_income_count
+        expense_count += closing.total_expense_count
+    return {
+        transaction_key(FinancialTransaction.TYPE_ENTRATA): (income_count, income),
+        transaction_key(FinancialTransaction.TYPE_USCITA): (expense_count, expense),
+    }
+
+
+def _fee_figures() -> Figures:
+    figures: Figures = {fee_key(value): (0, Decimal("0")) for value, _ in MembershipFee.STATUS_CHOICES}
+    rows = MembershipFee.objects.order_by().values("status").annotate(count=Count("id"), total=Sum("amount"))
+    for row in rows:
+        figures[fee_key(row["status"])] = (row["count"], row["total"] or Decimal("0"))
+    return figures
+
+
+def live_figures() -> Figures:
+    """Ricalcola i valori del riepilogo direttamente dalle tabelle di origine."""
+
+    figures: Figures = {
+        ACTIVE_MEMBERS_KEY: (Member.objects.filter(active=True).count(), Decimal("0")),
+        EVENTS_KEY: (Event.objects.count(), Decimal("0")),
+    }
+    figures.update(_transaction_figures())
+    figures.update(_fee_figures())
+    return figures
+
+
+def ledger_totals(queryset: QuerySet | None = None) -> dict:
+    """Entrate, uscite e saldo dei movimenti con un'unica aggregazione condizionale.
+
+    Senza ``queryset`` riguarda l'intero registro: l'ultima chiusura d'esercizio
+    piu' i soli movimenti del periodo aperto.
+    """
+
+    closing = None
+    if queryset is None:
+        closing = fiscal.latest_closing()
+        queryset = fiscal.open_transactions(closing)
+    totals = queryset.order_by().aggregate(
+        income=Sum("amount", filter=Q(transaction_type=FinancialTransaction.TYPE_ENTRATA)),
+        expense=Sum("amount", filter=Q(transaction_type=FinancialTransaction.TYPE_USCITA)),
+    )
+    income = totals["income"] or Decimal("0")
+    expense = totals["expense"] or Decimal("0")
+    if closing:
+        income, expense = income + closing.total_income, expense + closing.total_expense
+    return {"income": income, "expense": expense, "balance": income - expense}
+
+
+def stored_figures() -> Figures:
+    """Legge tutte le righe del riepilogo con una sola query."""
+
+    figures: Figures = {key: (0, Decimal("0")) for key in all_keys()}
+    for key, count, total in FinancialSummary.objects.values_list("key", "count", "total"):
+        figures[key] = (count, total)
+    return figures
+
+
+@transaction.atomic
+def rebuild() -> Figures:
+    """Ricostruisce da zero la tabella di riepilogo."""
+
+    figures = live_figures()
+    FinancialSummary.objects.all().delete()
+    FinancialSummary.objects.bulk_create(
+        FinancialSummary(key=key, count=count, total=total) for key, (count, total) in figures.items()
+    )
+    return figures
+
+
+def refresh_fee_figures() -> None:
+    """Riallinea le sole righe delle quote dopo operazioni massive che saltano i segnali.
+
+    Le righe sono bloccate prima di ricalcolare: l'incremento di una quota
+    salvata nel frattempo attende il commit e si somma al valore ricalcolato,
+    invece di essere contato due volte o perso.
+    """
+
+    keys = [fee_key(value) for value, _ in MembershipFee.STATUS_CHOICES]
+    with transaction.atomic():
+        list(FinancialSummary.objects.select_for_update().filter(key__in=keys).values_list("pk", flat=True))
+        for key, (count, total) in _fee_figures().items():
+            FinancialSummary.objects.update_or_create(key=key, defaults={"count": count, "total": total})
+
+
+def check() -> List[str]:
+    """Confronta il riepilogo con gli aggregati reali e restituisce le differenze."""
+
+    stored = stored_figures()
+    differences = []
+    for key, expected in live_figures().items():
+        if stored.get(key) != expected:
+            differences.append(f"{key}: registrato {stored.get(key)}, atteso {expected}")
+    return differences
+
+
+def dashboard_figures() -> dict:
+    figures = stored_figures()
+    income_total = figures[transaction_key(FinancialTransaction.TYPE_ENTRATA)][1]
+    expense_total = figures[transaction_key(FinancialTransaction.TYPE_USCITA)][1]
+    fees_status = [
+        {"status": status, "total": figures[fee_key(status)][0]}
+        for status, _ in sorted(MembershipFee.STATUS_CHOICES)
+        if figures[fee_key(status)][0]
+    ]
+    return {
+        "members_count": figures[ACTIVE_MEMBERS_KEY][0],
+        "events_count": figures[EVENTS_KEY][0],
+        "income_total": income_total,
+        "expense_total": expense_total,
+        "balance": income_total - expense_total,
+        "fees_status": fees_status,
+    }
@@ -14,16 +14,24 @@ urlpatterns = [
     path("dashboard/", views.dashboard, name="dashboard"),
     path("iscritti/", views.members_list, name="members_list"),
     path("iscritti/add/", views.member_create, name="member_create"),
+    path("iscritti/importa/", views.members_import, name="members_import"),
     path("iscritti/<int:pk>/edit/", views.member_update, name="member_update"),
     path("iscritti/<int:pk>/delete/", views.member_delete, name="member_delete"),
     path("quote/", views.fees_list, name="fees_list"),
     path("quote/add/", views.fees_manage, name="fees_create"),
+    path("quote/genera/", views.fees_generate, name="fees_generate"),
+    path("quote/riconcilia/", views.fees_reconcile, name="fees_reconcile"),
     path("quote/<int:member_id>/", views.member_fees, name="member_fees"),
     path("eventi/", views.events_list, name="events_list"),
     path("eventi/add/", views.event_create, name="event_create"),
     path("eventi/<int:pk>/edit/", views.event_update, name="event_update"),
     path("eventi/<int:event_id>/iscriviti/", views.event_register, name="event_register"),
+    path("eventi/<int:event_id>/checkin/", views.event_checkin, name="event_checkin"),
     path("eventi/<int:event_id>/partecipazioni/<int:pk>/", views.participation_update, name="participation_update"),
     path("movimenti/", views.transactions_list, name="transactions_list"),
     path("movimenti/add/", views.transaction_create, name="transaction_create"),
+    path("movimenti/rendiconto/", views.financial_report, name="financial_report"),
+    path("esporta/<slug:kind>.csv", views.export_csv, name="export_csv"),
+    path("cerca/", views.global_search, name="search"),
+    path("prestazioni/", views.performance_report, name="performance_report"),
 ]
@@ -3,7 +3,10 @@ from __future__ import annotations
 from functools import wraps
 from typing import Callable
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.db.models import Q, QuerySet
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import redirect
 from django.urls import reverse
@@ -23,3 +26,44 @@ def admin_required(view_func: Callable):
         return view_func(request, *args, **kwargs)
 
     return _wrapped_view
+
+
+def _load_user(request: HttpRequest):
+    request.user.is_authenticated  # risolve il SimpleLazyObject leggendo la sessione
+    return request.user
+
+
+async def aget_user(request: HttpRequest):
+    """Carica ``request.user`` da una vista asincrona (Django 4.2 non ha ``request.auser()``)."""
+
+    return await sync_to_async(_load_user)(request)
+
+
+def async_login_required(view_func: Callable):
+    """Equivalente di ``login_required`` per le viste ``async def``."""
+
+    @wraps(view_func)
+    async def _wrapped_view(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+
+    return _wrapped_view
+
+
+async def alist(queryset: QuerySet) -> list:
+    """Valuta il queryset con l'ORM asincrono."""
+
+    return [item async for item in queryset.aiterator()]
+
+
+def prefix_filter(field: str, prefix: str) -> Q:
+    """``field`` inizia con ``prefix``, espresso come intervallo ``>= prefix AND < successivo``.
+
+    A differenza di ``LIKE 'prefisso%'``, che usa l'indice solo con collazioni
+    particolari, l'intervallo e' servito da un normale indice B-tree.
+    """
+
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f"{field}__gte": prefix, f"{field}__lt": upper})
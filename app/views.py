@@ -1,40 +1,84 @@
 from __future__ import annotations
 
+import json
 from datetime import datetime
+from decimal import Decimal
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Sum
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 
+from . import middleware, reports, search, summaries
+from .caching import aevent_lists, anonymous_page_cache
+from .checkin import check_in, split_codes
+from .exports import EXPORTS, csv_lines, export_rows
+from .fee_campaigns import generate_fees
 from .forms import (
     EventForm,
+    FeeCampaignForm,
+    FinancialReportForm,
     FinancialTransactionForm,
     MemberForm,
+    MemberImportUploadForm,
+    MemberSearchForm,
     MemberUserForm,
     MembershipFeeForm,
     ParticipationForm,
     PasswordAggiornamentoForm,
+    StatementUploadForm,
     UserProfileForm,
 )
-from .models import Event, FinancialTransaction, Member, MembershipFee, Participation
-from .utils import admin_required
+from .member_import import ImportFileError, import_members, read_rows
+from .models import (
+    Event,
+    FinancialTransaction,
+    Member,
+    MembershipFee,
+    Participation,
+    SearchDocument,
+    User,
+)
+from .pagination import paginate
+from .reconciliation import StatementError, reconcile_file
+from .registrations import register
+from .utils import admin_required, aget_user, alist, async_login_required
 
+TRANSACTIONS_PER_PAGE = 50
+MEMBERS_PER_PAGE = 50
+SEARCH_RESULTS = 30
+REPORT_YEARS = 5  # anni mostrati per default nel rendiconto annuale
 
-def public_home(request):
-    upcoming_events = Event.objects.filter(date__gte=timezone.now()).order_by("date")
-    participations = []
-    if request.user.is_authenticated and hasattr(request.user, "member"):
-        participations = Participation.objects.filter(
-            member=request.user.member, event__in=upcoming_events
-        ).values_list("event_id", flat=True)
-    return render(
+
+async def _user_participations(user, since: datetime | None = None) -> dict:
+    """``{id evento: in lista d'attesa}`` per le iscrizioni dell'utente."""
+
+    if not user.is_authenticated or not user.member_id:
+        return {}
+    participations = Participation.objects.filter(member_id=user.member_id)
+    if since is not None:
+        participations = participations.filter(event__date__gte=since)
+    # values() e non values_list(): in Django 4.2 aiterator() non supporta le tuple di values_list()
+    rows = await alist(participations.values("event_id", "waitlisted"))
+    return {row["event_id"]: row["waitlisted"] for row in rows}
+
+
+@anonymous_page_cache("home")
+async def public_home(request):
+    user = await aget_user(request)
+    now = timezone.now()
+    # l'ORM asincrono di Django 4.2 esegue le query una alla volta sul thread condiviso: gather non le sovrapporrebbe
+    events = await aevent_lists(now)
+    participations = await _user_participations(user, since=now)
+    return await sync_to_async(render)(
         request,
         "home.html",
         {
-            "events": upcoming_events,
+            "events": events["upcoming"],
             "participations": participations,
         },
     )
@@ -77,44 +121,35 @@ def profile(request):
 
 @admin_required
 def dashboard(request):
-    members_count = Member.objects.filter(active=True).count()
-    events_count = Event.objects.count()
-    income_total = (
-        FinancialTransaction.objects.filter(transaction_type=FinancialTransaction.TYPE_ENTRATA)
-        .aggregate(total=Sum("amount"))
-        .get("total")
-        or 0
-    )
-    expense_total = (
-        FinancialTransaction.objects.filter(transaction_type=FinancialTransaction.TYPE_USCITA)
-        .aggregate(total=Sum("amount"))
-        .get("total")
-        or 0
-    )
-    balance = income_total - expense_total
-    recent_events = Event.objects.order_by("-date")[:5]
-    fees_status = (
-        MembershipFee.objects.values("status")
-        .annotate(total=Count("id"))
-        .order_by("status")
-    )
-
-    context = {
-        "members_count": members_count,
-        "events_count": events_count,
-        "income_total": income_total,
-        "expense_total": expense_total,
-        "balance": balance,
-        "recent_events": recent_events,
-        "fees_status": fees_status,
-    }
+    context = summaries.dashboard_figures()
+    context["recent_events"] = Event.objects.order_by("-date")[:5]
     return render(request, "dashboard.html", context)
 
 
 @admin_required
 def members_list(request):
-    members = Member.objects.all()
-    return render(request, "members/list.html", {"members": members})
+    form = MemberSearchForm(request.GET)
+    members, ordering = form.results()
+    page = paginate(members, ordering, request.GET.get("cursore"), MEMBERS_PER_PAGE)
+    params = request.GET.copy()
+    params.pop("cursore", None)
+    next_cursor = page.next_cursor()
+    next_query = ""
+    if next_cursor:
+        params["cursore"] = next_cursor
+        next_query = params.urlencode()
+        params.pop("cursore")
+    return render(
+        request,
+        "members/list.html",
+        {
+            "form": form,
+            "members": page.items,
+            "page": page,
+            "first_query": params.urlencode(),
+            "next_query": next_query,
+        },
+    )
 
 
 @admin_required
@@ -130,16 +165,33 @@ def member_create(request):
     return render(request, "members/form.html", {"form": form, "title": "Nuovo iscritto"})
 
 
+@admin_required
+def members_import(request):
+    result = None
+    if request.method == "POST":
+        form = MemberImportUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data["file"]
+            try:
+                result = import_members(
+                    read_rows(upload.file, upload.name), password=form.cleaned_data["password"] or None
+                )
+            except ImportFileError as exc:
+                form.add_error("file", str(exc))
+            else:
+                messages.success(request, f"Importati {result.created} iscritti.")
+    else:
+        form = MemberImportUploadForm()
+    return render(request, "members/import.html", {"form": form, "result": result})
+
+
 @admin_required
 def member_update(request, pk: int):
     member = get_object_or_404(Member, pk=pk)
     if request.method == "POST":
         form = MemberForm(request.POST, instance=member)
         if form.is_valid():
-            member = form.save()
-            if hasattr(member, "user"):
-                member.user.role = member.role
-                member.user.save(update_fields=["role"])
+            form.save()  # il ruolo dell'utente collegato segue quello dell'iscritto (signals.member_saved)
             messages.success(request, "Iscritto aggiornato correttamente.")
             return redirect("members_list")
     else:
@@ -162,35 +214,38 @@ def fees_list(request):
     if getattr(request.user, "is_administrator", False):
         fees = MembershipFee.objects.select_related("member")
     else:
-        fees = MembershipFee.objects.filter(member=request.user.member)
+        fees = MembershipFee.objects.filter(member=request.user.member).select_related("member")
     return render(request, "fees/list.html", {"fees": fees})
 
 
-@login_required
-def member_fees(request, member_id: int):
-    member = get_object_or_404(Member, pk=member_id)
-    if request.user.is_associate and request.user.member != member:
+@async_login_required
+async def member_fees(request, member_id: int):
+    if request.user.member_id == member_id and User.member.is_cached(request.user):
+        member = request.user.member  # gia' caricato insieme all'utente da MemberAwareBackend
+    else:
+        try:
+            member = await Member.objects.aget(pk=member_id)
+        except Member.DoesNotExist:
+            raise Http404("Iscritto non trovato.")
+    if request.user.is_associate and request.user.member_id != member.pk:
         messages.error(request, "Non puoi visualizzare le quote di altri associati.")
         return redirect("fees_list")
-    fees = member.fees.all().order_by("-year")
-    return render(request, "fees/detail.html", {"member": member, "fees": fees})
+    fees = await alist(member.fees.order_by("-year"))
+    return await sync_to_async(render)(request, "fees/detail.html", {"member": member, "fees": fees})
 
 
-def events_list(request):
-    now = timezone.now()
-    future_events = Event.objects.filter(date__gte=now).order_by("date")
-    past_events = Event.objects.filter(date__lt=now).order_by("-date")[:5]
-    user_participations = []
-    if hasattr(request.user, "member"):
-        user_participations = Participation.objects.filter(member=request.user.member).values_list(
-            "event_id", flat=True
-        )
+@anonymous_page_cache("events_list")
+async def events_list(request):
+    user = await aget_user(request)
+    events = await aevent_lists()
+    user_participations = await _user_participations(user)
     context = {
-        "future_events": future_events,
-        "past_events": past_events,
+        "future_events": events["upcoming"],
+        "past_events": events["past"],
         "user_participations": user_participations,
+        "user_waitlist": [event_id for event_id, waitlisted in user_participations.items() if waitlisted],
     }
-    return render(request, "events/list.html", context)
+    return await sync_to_async(render)(request, "events/list.html", context)
 
 
 @admin_required
@@ -222,20 +277,52 @@ def event_update(request, pk: int):
 
 @login_required
 def event_register(request, event_id: int):
-    event = get_object_or_404(Event, pk=event_id)
     try:
         member = request.user.member
     except Member.DoesNotExist:
+        member = None
+    if member is None:
         messages.error(request, "Solo gli iscritti possono registrarsi agli eventi.")
         return redirect("events_list")
-    participation, created = Participation.objects.get_or_create(member=member, event=event)
-    if created:
-        messages.success(request, "Iscrizione all'evento registrata.")
+    try:
+        result = register(event_id, member)
+    except Event.DoesNotExist:
+        raise Http404("Evento non trovato.")
+    if not result.created:
+        if result.waitlisted:
+            messages.info(request, "Sei gia in lista d'attesa per questo evento.")
+        else:
+            messages.info(request, "Sei gia iscritto a questo evento.")
+    elif result.waitlisted:
+        messages.warning(request, "L'evento e' al completo: sei stato inserito in lista d'attesa.")
     else:
-        messages.info(request, "Sei gia iscritto a questo evento.")
+        messages.success(request, "Iscrizione all'evento registrata.")
     return redirect("events_list")
 
 
+@admin_required
+def event_checkin(request, event_id: int):
+    """Schermata di check-in; in POST aggiorna le presenze e risponde con la differenza in JSON."""
+
+    event = get_object_or_404(Event, pk=event_id)
+    if request.method == "POST":
+        if request.content_type == "application/json":
+            try:
+                payload = json.loads(request.body or b"{}")
+            except ValueError:
+                return JsonResponse({"error": "JSON non valido."}, status=400)
+            codes = payload.get("codes", []) if isinstance(payload, dict) else None
+            presence = payload.get("presence", True) if isinstance(payload, dict) else None
+            if not isinstance(codes, list) or not isinstance(presence, bool):
+                return JsonResponse({"error": "Attesi 'codes' (lista) e 'presence' (booleano)."}, status=400)
+        else:
+            codes = split_codes(request.POST.get("codes", ""))
+            presence = request.POST.get("presence", "1") != "0"
+        return JsonResponse(check_in(event.pk, codes, presence=presence).as_dict())
+    context = {"event": event, "confirmed": event.participants_count, "present": event.present_count}
+    return render(request, "events/checkin.html", context)
+
+
 @admin_required
 def participation_update(request, event_id: int, pk: int):
     participation = get_object_or_404(Participation, pk=pk, event_id=event_id)
@@ -256,22 +343,31 @@ def participation_update(request, event_id: int, pk: int):
 
 @admin_required
 def transactions_list(request):
-    transactions = FinancialTransaction.objects.select_related("event")
-    total_income = transactions.filter(transaction_type=FinancialTransaction.TYPE_ENTRATA).aggregate(
-        total=Sum("amount")
-    )["total"] or 0
-    total_expense = transactions.filter(transaction_type=FinancialTransaction.TYPE_USCITA).aggregate(
-        total=Sum("amount")
-    )["total"] or 0
-    balance = total_income - total_expense
+    totals = summaries.ledger_totals()
+    page = paginate(
+        FinancialTransaction.objects.select_related("event"),
+        FinancialTransaction._meta.ordering,
+        request.GET.get("cursore"),
+        TRANSACTIONS_PER_PAGE,
+    )
+    running_balance = Decimal(page.state.get("saldo", totals["balance"]))
+    rows = []
+    for entry in page.items:
+        rows.append((entry, running_balance))
+        if entry.transaction_type == FinancialTransaction.TYPE_ENTRATA:
+            running_balance -= entry.amount
+        else:
+            running_balance += entry.amount
     return render(
         request,
         "transactions/list.html",
         {
-            "transactions": transactions,
-            "total_income": total_income,
-            "total_expense": total_expense,
-            "balance": balance,
+            "rows": rows,
+            "page": page,
+            "next_cursor": page.next_cursor(saldo=str(running_balance)),
+            "total_income": totals["income"],
+            "total_expense": totals["expense"],
+            "balance": totals["balance"],
         },
     )
 
@@ -289,6 +385,21 @@ def transaction_create(request):
     return render(request, "transactions/form.html", {"form": form, "title": "Nuovo movimento"})
 
 
+@admin_required
+def financial_report(request):
+    """Rendiconto per mese, trimestre o anno; con ``formato=json`` risponde in JSON."""
+
+    form = FinancialReportForm(request.GET)
+    filters = form.cleaned_data if form.is_valid() else {}
+    granularity = filters.get("periodo") or "mese"
+    last_year = filters.get("a") or timezone.localdate().year
+    first_year = filters.get("da") or last_year - (REPORT_YEARS - 1 if granularity == "anno" else 0)
+    report = reports.build_report(granularity, first_year, last_year, by_event=bool(filters.get("per_evento")))
+    if request.GET.get("formato") == "json":
+        return JsonResponse(report.as_dict())
+    return render(request, "transactions/report.html", {"form": form, "report": report})
+
+
 @admin_required
 def fees_manage(request):
     if request.method == "POST":
@@ -300,3 +411,79 @@ def fees_manage(request):
     else:
         form = MembershipFeeForm()
     return render(request, "fees/form.html", {"form": form, "title": "Nuova quota"})
+
+
+@admin_required
+def fees_generate(request):
+    result = None
+    if request.method == "POST":
+        form = FeeCampaignForm(request.POST)
+        if form.is_valid():
+            result = generate_fees(**form.cleaned_data)
+            if not result.dry_run:
+                messages.success(request, f"Create {result.created} quote per il {result.year}.")
+                return redirect("fees_list")
+    else:
+        form = FeeCampaignForm(initial={"year": timezone.now().year})
+    return render(request, "fees/generate.html", {"form": form, "result": result})
+
+
+@admin_required
+def fees_reconcile(request):
+    result = None
+    if request.method == "POST":
+        form = StatementUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data["file"]
+            try:
+                result = reconcile_file(upload.file, upload.name, dry_run=form.cleaned_data["dry_run"])
+            except StatementError as exc:
+                form.add_error("file", str(exc))
+            else:
+                if not result.dry_run:
+                    messages.success(request, f"Registrati {len(result.matched)} pagamenti.")
+    else:
+        form = StatementUploadForm()
+    return render(request, "fees/reconcile.html", {"form": form, "result": result})
+
+
+@admin_required
+def global_search(request):
+    """Ricerca su iscritti, eventi e movimenti; con ``formato=json`` risponde in JSON."""
+
+    text = request.GET.get("q", "").strip()
+    kind = request.GET.get("tipo", "")
+    if kind not in dict(SearchDocument.KIND_CHOICES):
+        kind = ""
+    results = search.search(text, kind=kind or None, limit=SEARCH_RESULTS)
+    if request.GET.get("formato") == "json":
+        return JsonResponse({"query": text, "results": [result.as_dict() for result in results]})
+    return render(
+        request,
+        "search.html",
+        {"query": text, "kind": kind, "kinds": SearchDocument.KIND_CHOICES, "results": results},
+    )
+
+
+@admin_required
+def performance_report(request):
+    return render(
+        request,
+        "performance/report.html",
+        {
+            "enabled": settings.ASSOHUB_PERFORMANCE,
+            "samples_count": len(middleware.recent_samples()),
+            "slowest_routes": middleware.slowest_routes(),
+            "worst_duplicates": middleware.worst_duplicates(),
+        },
+    )
+
+
+@admin_required
+def export_csv(request, kind: str):
+    if kind not in EXPORTS:
+        raise Http404("Esportazione non disponibile.")
+    response = StreamingHttpResponse(csv_lines(export_rows(kind, request.GET)), content_type="text/csv")
+    filename = f"{kind}-{timezone.localdate():%Y%m%d}.csv"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -1,13 +1,19 @@
 """Django settings for AssoHUB project."""
+import os
 from pathlib import Path
 
+from config import load_settings
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-SECRET_KEY = "django-insecure-2vioole1_whs0plzfg$a@!jmxkn1a+*(l3@24%w)7%j5uh%uk^"
+# Impostazioni lette dall'ambiente (vedi config.py); in produzione chiave e host sono obbligatori
+RUNTIME = load_settings()
+
+SECRET_KEY = RUNTIME.secret_key or "django-insecure-2vioole1_whs0plzfg$a@!jmxkn1a+*(l3@24%w)7%j5uh%uk^"
 
-DEBUG = True
+DEBUG = not RUNTIME.is_production
 
-ALLOWED_HOSTS: list[str] = []
+ALLOWED_HOSTS: list[str] = RUNTIME.allowed_hosts
 
 INSTALLED_APPS = [
     "django.contrib.admin",
@@ -30,6 +36,12 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Strumentazione opzionale delle richieste (header Server-Timing e pagina /prestazioni/)
+ASSOHUB_PERFORMANCE = os.environ.get("ASSOHUB_PERFORMANCE", "") == "1"
+ASSOHUB_PERFORMANCE_BUFFER = int(os.environ.get("ASSOHUB_PERFORMANCE_BUFFER", "500"))
+if ASSOHUB_PERFORMANCE:
+    MIDDLEWARE.insert(0, "app.middleware.PerformanceMiddleware")
+
 ROOT_URLCONF = "assohub.urls"
 
 TEMPLATES = [
@@ -50,12 +62,29 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "assohub.wsgi.application"
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# SQLite per default; DATABASE_URL=postgres://... per PostgreSQL (vedi config.py)
+DATABASES = {"default": RUNTIME.database()}
+
+# Profilo SQLite per l'accesso concorrente (WAL, busy_timeout, connessioni persistenti): vedi app/database.py
+ASSOHUB_SQLITE_TUNED = RUNTIME.sqlite_tuned
+
+# Cache locale al processo; con ASSOHUB_CACHE_DIR si usa una cache su file condivisa tra i worker
+if os.environ.get("ASSOHUB_CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ["ASSOHUB_CACHE_DIR"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "assohub",
+        }
     }
-}
+
+AUTHENTICATION_BACKENDS = ["app.backends.MemberAwareBackend"]
 
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -74,6 +103,8 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 STATICFILES_DIRS = [BASE_DIR / "app" / "static"]
+# in produzione: manage.py collectstatic e STATIC_ROOT servita su /static/ dal proxy (nginx, ...)
+STATIC_ROOT = RUNTIME.static_root
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -1,15 +1,81 @@
-"""Punto di ingresso per avviare l'applicazione AssoHUB."""
+"""Punto di ingresso per avviare l'applicazione AssoHUB.
+
+In sviluppo avvia ``runserver``. Con ``ASSOHUB_MODE=produzione`` avvia
+gunicorn con worker pre-fork (``ASSOHUB_SERVER=asgi`` per i worker uvicorn);
+l'applicazione viene caricata una sola volta nel processo principale prima
+del fork, cosi' i worker ne condividono la memoria in copy-on-write.
+"""
 from __future__ import annotations
 
 import os
 import sys
 
+from config import SERVER_ASGI, Settings, load_settings
+
+
+def gunicorn_options(settings: Settings) -> dict:
+    """Opzioni di gunicorn corrispondenti alle impostazioni."""
+
+    options = {
+        "bind": settings.bind,
+        "workers": settings.workers,
+        "keepalive": settings.keepalive,
+        "timeout": settings.timeout,
+        "max_requests": settings.max_requests,
+        "max_requests_jitter": settings.max_requests_jitter,
+        "preload_app": True,
+    }
+    if settings.server == SERVER_ASGI:
+        options["worker_class"] = "uvicorn.workers.UvicornWorker"
+    elif settings.threads > 1:
+        options["worker_class"] = "gthread"
+        options["threads"] = settings.threads
+    return options
+
+
+def load_application(server: str):
+    if server == SERVER_ASGI:
+        from assohub.asgi import application
+    else:
+        from assohub.wsgi import application
+    from django.db import connections
+
+    # le connessioni aperte durante il caricamento non vanno condivise tra i worker
+    connections.close_all()
+    return application
+
+
+def serve(settings: Settings) -> None:
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:  # dipendenza opzionale
+        sys.exit("La modalita' produzione richiede gunicorn: pip install -r requirements-prod.txt")
+    if settings.server == SERVER_ASGI:
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            sys.exit("Il server ASGI richiede uvicorn: pip install -r requirements-prod.txt")
+
+    class AssoHubApplication(BaseApplication):
+        def load_config(self) -> None:
+            for key, value in gunicorn_options(settings).items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_application(settings.server)
+
+    AssoHubApplication().run()
+
 
 def main() -> None:
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "assohub.settings")
+    settings = load_settings()
+    if settings.is_production:
+        serve(settings)
+        return
     from django.core.management import execute_from_command_line
 
-    execute_from_command_line([sys.argv[0], "runserver", "0.0.0.0:8000"])
+    execute_from_command_line([sys.argv[0], "runserver", settings.bind])
 
 
 if __name__ == "__main__":